@@ -0,0 +1,102 @@
+"""
+Maintenance of the UserHierarchy closure table over User.manager.
+
+Every user has a depth-0 row pointing at themselves plus one row per
+manager above them, so "everyone under X" is a single indexed lookup on
+`ancestor`. Changing a user's manager only rewrites the rows that connect
+that user's subtree to the ancestors above it.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import UserHierarchy
+
+
+def add_user(user):
+    """
+    Insert the closure rows for a newly created user
+    """
+    rows = [UserHierarchy(ancestor_id=user.pk, descendant_id=user.pk, depth=0)]
+    if user.manager_id:
+        rows.extend(
+            UserHierarchy(ancestor_id=ancestor_id, descendant_id=user.pk, depth=depth + 1)
+            for ancestor_id, depth in UserHierarchy.objects.filter(
+                descendant_id=user.manager_id
+            ).values_list('ancestor_id', 'depth')
+        )
+    UserHierarchy.objects.bulk_create(rows)
+
+
+def move_subtree(user_id, new_manager_id):
+    """
+    Re-parent `user_id` and everyone below them under `new_manager_id`
+    """
+    with transaction.atomic():
+        subtree = list(
+            UserHierarchy.objects.filter(ancestor_id=user_id).values_list('descendant_id', 'depth')
+        )
+        if not subtree:
+            # User predates the closure table; give them their self row first
+            UserHierarchy.objects.create(ancestor_id=user_id, descendant_id=user_id, depth=0)
+            subtree = [(user_id, 0)]
+        
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        if new_manager_id in subtree_ids:
+            raise ValidationError('A user cannot report to themselves or to one of their reports.')
+        
+        # Detach the subtree from its old ancestors
+        UserHierarchy.objects.filter(
+            descendant_id__in=subtree_ids
+        ).exclude(
+            ancestor_id__in=subtree_ids
+        ).delete()
+        
+        if new_manager_id is None:
+            return
+        
+        # Attach it below every ancestor of the new manager
+        ancestors = UserHierarchy.objects.filter(
+            descendant_id=new_manager_id
+        ).values_list('ancestor_id', 'depth')
+        UserHierarchy.objects.bulk_create([
+            UserHierarchy(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + descendant_depth + 1,
+            )
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, descendant_depth in subtree
+        ], batch_size=1000)
+
+
+def build_rows(manager_by_user):
+    """
+    Compute the full closure for a {user_id: manager_id} mapping
+    """
+    rows = []
+    for user_id in manager_by_user:
+        depth = 0
+        current = user_id
+        seen = set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            rows.append((current, user_id, depth))
+            current = manager_by_user.get(current)
+            depth += 1
+    return rows
+
+
+def rebuild():
+    """
+    Recompute the whole closure table from User.manager
+    """
+    from .models import User
+    
+    manager_by_user = dict(User.objects.values_list('id', 'manager_id'))
+    with transaction.atomic():
+        UserHierarchy.objects.all().delete()
+        UserHierarchy.objects.bulk_create([
+            UserHierarchy(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+            for ancestor_id, descendant_id, depth in build_rows(manager_by_user)
+        ], batch_size=1000)
+    return len(manager_by_user)
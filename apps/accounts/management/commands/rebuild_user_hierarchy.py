@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts import hierarchy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the user hierarchy closure table from User.manager'
+
+    def handle(self, *args, **options):
+        count = hierarchy.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt hierarchy for {count} users')
+        )
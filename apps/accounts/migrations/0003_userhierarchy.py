@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_closure(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserHierarchy = apps.get_model('accounts', 'UserHierarchy')
+    
+    manager_by_user = dict(User.objects.values_list('id', 'manager_id'))
+    rows = []
+    for user_id in manager_by_user:
+        depth = 0
+        current = user_id
+        seen = set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            rows.append(UserHierarchy(ancestor_id=current, descendant_id=user_id, depth=depth))
+            current = manager_by_user.get(current)
+            depth += 1
+    UserHierarchy.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_add_company_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserHierarchy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Hierarchy',
+                'verbose_name_plural': 'User Hierarchy',
+                'db_table': 'user_hierarchy',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='user_hierar_descend_81114d_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import RegexValidator
 
 
@@ -58,6 +58,35 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'manager_id' in field_names:
+            instance._loaded_manager_id = values[field_names.index('manager_id')]
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from . import hierarchy
+        
+        adding = self._state.adding
+        manager_changed = self.manager_id != getattr(self, '_loaded_manager_id', object())
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                hierarchy.add_user(self)
+            elif manager_changed:
+                hierarchy.move_subtree(self.pk, self.manager_id)
+        self._loaded_manager_id = self.manager_id
+    
+    def delete(self, *args, **kwargs):
+        from . import hierarchy
+        
+        with transaction.atomic():
+            # Reports become roots once their manager is gone (manager is SET_NULL)
+            for subordinate_id in self.subordinates.values_list('id', flat=True):
+                hierarchy.move_subtree(subordinate_id, None)
+            return super().delete(*args, **kwargs)
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -72,6 +101,28 @@ class User(AbstractUser):
         return self.role == 'employee'
 
 
+class UserHierarchy(models.Model):
+    """
+    Closure table over User.manager with one row per (ancestor, descendant)
+    pair, including a depth-0 row for every user
+    """
+    ancestor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+    
+    class Meta:
+        db_table = 'user_hierarchy'
+        verbose_name = 'User Hierarchy'
+        verbose_name_plural = 'User Hierarchy'
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 class UserProfile(models.Model):
     """
     Extended user profile information
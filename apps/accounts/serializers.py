@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from .models import User, UserProfile, PasswordResetToken
+from .models import User, UserProfile, PasswordResetToken, UserHierarchy
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -26,6 +26,13 @@ class UserSerializer(serializers.ModelSerializer):
             'profile', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'is_verified', 'created_at', 'updated_at']
+    
+    def validate_manager(self, value):
+        if value and self.instance and UserHierarchy.objects.filter(
+            ancestor=self.instance, descendant=value
+        ).exists():
+            raise serializers.ValidationError("A user cannot report to themselves or to one of their reports.")
+        return value
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
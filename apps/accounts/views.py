@@ -9,6 +9,9 @@ from django.utils import timezone
 from datetime import timedelta
 import uuid
 
+from apps.core.conditional import ConditionalGetMixin
+from apps.expenses.models import EmployeeExpenseCounter
+
 from .models import User, UserProfile, PasswordResetToken
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
@@ -38,13 +41,15 @@ class UserListCreateView(generics.ListCreateAPIView):
         return User.objects.all()
 
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a user
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # The payload nests the profile
+    last_modified_fields = ('updated_at', 'profile__updated_at')
     
     def get_queryset(self):
         # Users can only see users from their company
@@ -184,14 +189,17 @@ def user_stats_view(request):
     """
     Get user statistics
     """
-    user = request.user
+    # Counters are maintained on every expense write, so this is one PK read
+    counter = EmployeeExpenseCounter.objects.filter(pk=request.user.pk).first()
+    if counter is None:
+        counter = EmployeeExpenseCounter(employee_id=request.user.pk)
     
     stats = {
-        'total_expenses': user.expenses.count(),
-        'pending_expenses': user.expenses.filter(status='pending').count(),
-        'approved_expenses': user.expenses.filter(status='approved').count(),
-        'rejected_expenses': user.expenses.filter(status='rejected').count(),
-        'total_amount': sum(expense.amount for expense in user.expenses.filter(status='approved')),
+        'total_expenses': counter.total_count,
+        'pending_expenses': counter.pending_count,
+        'approved_expenses': counter.approved_count,
+        'rejected_expenses': counter.rejected_count,
+        'total_amount': counter.approved_amount,
     }
     
     return Response(stats)
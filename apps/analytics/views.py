@@ -1,5 +1,6 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from apps.core.conditional import ConditionalGetMixin
 from .models import ExpenseAnalytics, CategoryAnalytics, EmployeeAnalytics, ApprovalAnalytics, Report, DashboardWidget, Alert
 from .serializers import ExpenseAnalyticsSerializer, CategoryAnalyticsSerializer, EmployeeAnalyticsSerializer, ApprovalAnalyticsSerializer, ReportSerializer, DashboardWidgetSerializer, AlertSerializer
 
@@ -34,7 +35,7 @@ class ReportListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ReportDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReportDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated]
@@ -58,7 +59,7 @@ class DashboardWidgetListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class DashboardWidgetDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DashboardWidgetDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = DashboardWidget.objects.all()
     serializer_class = DashboardWidgetSerializer
     permission_classes = [IsAuthenticated]
@@ -70,7 +71,7 @@ class AlertListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class AlertDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AlertDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
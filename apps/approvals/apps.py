@@ -5,3 +5,6 @@ class ApprovalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.approvals'
     verbose_name = 'Approvals'
+    
+    def ready(self):
+        from . import signals
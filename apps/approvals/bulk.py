@@ -0,0 +1,96 @@
+"""
+Background execution of BulkApproval jobs.
+
+A job's expenses are approved or rejected in chunks of `chunk_size`. Each
+chunk is one transaction that locks the job row (skipping jobs another
+worker holds), runs `transitions.bulk_transition` over the next slice of
+`expense_ids` and advances `processed_count` and the success and failure
+counters in the same commit. A worker that dies mid-job loses at most its
+uncommitted chunk, and the next run resumes from `processed_count`.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from apps.expenses import transitions
+from apps.notifications.models import Notification
+
+from .models import BulkApproval
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def claim_chunk(chunk_size):
+    """
+    Lock the oldest unfinished job no other worker holds, process its next
+    chunk and return the job, or None when there is no work
+    """
+    with transaction.atomic():
+        job = (
+            BulkApproval.objects.filter(status__in=['pending', 'processing'])
+            .select_related('approver')
+            .order_by('created_at', 'id')
+            .select_for_update(skip_locked=True, of=('self',))
+            .first()
+        )
+        if job is None:
+            return None
+        try:
+            with transaction.atomic():
+                process_chunk(job, chunk_size)
+        except Exception as e:
+            # Keep the counters of the committed chunks and stop retrying
+            job.refresh_from_db()
+            job.status = 'failed'
+            job.completed_at = timezone.now()
+            job.error_log += f'Stopped after {job.processed_count} expenses: {e}\n'
+            job.save(update_fields=['status', 'completed_at', 'error_log'])
+    return job
+
+
+def process_chunk(job, chunk_size):
+    """
+    Apply the job's action to its next `chunk_size` expenses; the caller
+    holds the job row lock
+    """
+    now = timezone.now()
+    chunk = job.expense_ids[job.processed_count:job.processed_count + chunk_size]
+    if chunk:
+        result = transitions.bulk_transition(chunk, job.action, job.approver, comments=job.comments, reason=job.comments)
+        succeeded = len(result.succeeded) + len(result.partial)
+        errors = ''.join(f'{expense_id}: {error}\n' for expense_id, error in result.failed.items())
+        # Duplicate IDs in the slice were applied once and count as done
+        job.processed_count += len(chunk)
+        job.success_count += succeeded
+        job.failure_count += len(result.failed)
+        job.error_log += errors
+    
+    job.status = 'processing'
+    if job.processed_count >= len(job.expense_ids):
+        job.status = 'failed' if job.expense_ids and not job.success_count else 'completed'
+        job.completed_at = now
+        Notification.objects.create(
+            recipient_id=job.approver_id,
+            notification_type='bulk_approval',
+            title=f'Bulk {job.action} finished',
+            message=(
+                f'{job.success_count} of {len(job.expense_ids)} expenses were '
+                f"{'approved' if job.action == 'approve' else 'rejected'}; {job.failure_count} failed."
+            ),
+        )
+    job.save(update_fields=[
+        'status', 'processed_count', 'success_count', 'failure_count', 'error_log', 'completed_at'
+    ])
+
+
+def process_pending(chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=None):
+    """
+    Work through unfinished jobs chunk by chunk; returns the number of
+    chunks processed
+    """
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        if claim_chunk(chunk_size) is None:
+            break
+        chunks += 1
+    return chunks
+
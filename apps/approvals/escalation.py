@@ -0,0 +1,135 @@
+"""
+Escalation of overdue approval workflow steps.
+
+`escalate_batch` claims up to `batch_size` active steps (those in an
+approver's inbox, see inbox.py) whose due date has passed, oldest first,
+skipping rows another sweeper holds, and in one short transaction:
+
+- hands each step to the approver's nearest active manager (through the
+  UserHierarchy closure table, never the expense's own employee), or to a
+  company admin at the top of the chain
+- gives it a new due date `escalation_hours` (company setting) from now
+- records EscalationLog rows and notifies both approvers with bulk_create
+
+Steps with nobody to escalate to keep their approver, who gets an overdue
+reminder, and a new due date so they are not claimed again at once.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import UserHierarchy
+from apps.companies.models import CompanySettings
+from apps.expenses.models import Expense
+from apps.notifications.models import Notification
+
+from . import inbox
+from .models import ApprovalWorkflow, EscalationLog
+from .rules import get_approvers
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_ESCALATION_HOURS = 48
+
+
+def get_targets(steps):
+    """
+    Map step ID to the user it escalates to, or None
+    """
+    ancestors = {}
+    for descendant_id, ancestor_id in (
+        UserHierarchy.objects.filter(
+            descendant_id__in={step.approver_id for step in steps}, depth__gt=0, ancestor__is_active=True
+        ).order_by('depth').values_list('descendant_id', 'ancestor_id')
+    ):
+        ancestors.setdefault(descendant_id, []).append(ancestor_id)
+    admins = {company_id: admin_id for company_id, (_, admin_id) in get_approvers({step.company_id for step in steps}).items()}
+    
+    targets = {}
+    for step in steps:
+        candidates = ancestors.get(step.approver_id, []) + [admins.get(step.company_id)]
+        targets[step.pk] = next(
+            (
+                user_id for user_id in candidates
+                if user_id and user_id not in (step.approver_id, step.expense.employee_id)
+            ),
+            None
+        )
+    return targets
+
+
+def escalate_batch(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Escalate one batch of overdue steps; returns (claimed, escalated)
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        steps = list(
+            inbox.active_steps().filter(due_date__lt=now)
+            .select_related('expense')
+            .only('id', 'company_id', 'approver_id', 'step_order', 'due_date', 'expense__id', 'expense__employee_id')
+            .order_by('due_date')
+            .select_for_update(skip_locked=True, of=('self',))[:batch_size]
+        )
+        if not steps:
+            return 0, 0
+        
+        targets = get_targets(steps)
+        hours = dict(
+            CompanySettings.objects.filter(company_id__in={step.company_id for step in steps})
+            .values_list('company_id', 'escalation_hours')
+        )
+        logs, notifications = [], []
+        # (new approver or None, new due date) -> step IDs; a batch has few
+        # distinct targets, so this is a handful of UPDATEs
+        updates = {}
+        for step in steps:
+            target_id = targets[step.pk]
+            due_date = now + timedelta(hours=hours.get(step.company_id) or DEFAULT_ESCALATION_HOURS)
+            updates.setdefault((target_id, due_date), []).append(step.pk)
+            if target_id is None:
+                notifications.append(Notification(
+                    recipient_id=step.approver_id,
+                    notification_type='approval_overdue',
+                    priority='high',
+                    title='Approval overdue',
+                    message=f'Expense {step.expense_id} has been waiting for your approval since {step.due_date:%Y-%m-%d %H:%M}.',
+                    expense_id=step.expense_id,
+                    approval_workflow_id=step.pk,
+                ))
+                continue
+            
+            logs.append(EscalationLog(
+                expense_id=step.expense_id,
+                from_approver_id=step.approver_id,
+                to_approver_id=target_id,
+                reason=f'Step {step.step_order} overdue since {step.due_date:%Y-%m-%d %H:%M}',
+            ))
+            notifications.extend(
+                Notification(
+                    recipient_id=recipient_id,
+                    notification_type='expense_escalated',
+                    priority='high',
+                    title=title,
+                    message=message.format(id=step.expense_id),
+                    expense_id=step.expense_id,
+                    approval_workflow_id=step.pk,
+                )
+                for recipient_id, title, message in (
+                    (target_id, 'Approval escalated to you', 'Expense {id} was escalated to you for approval.'),
+                    (step.approver_id, 'Approval escalated', 'Expense {id} was overdue and has been escalated.'),
+                )
+            )
+        
+        for (target_id, due_date), step_ids in updates.items():
+            values = {'due_date': due_date, 'updated_at': now}
+            if target_id is not None:
+                values.update(approver_id=target_id, escalated_to_id=target_id, escalated_at=now)
+            ApprovalWorkflow.objects.filter(id__in=step_ids).update(**values)
+        EscalationLog.objects.bulk_create(logs)
+        Notification.objects.bulk_create(notifications)
+        # Expense lists show the approvers; let cached copies revalidate
+        Expense.objects.filter(id__in={log.expense_id for log in logs}).update(updated_at=now)
+        approver_ids = {log.from_approver_id for log in logs} | {log.to_approver_id for log in logs}
+        transaction.on_commit(lambda: inbox.invalidate_counts(approver_ids))
+    return len(steps), len(logs)
@@ -0,0 +1,58 @@
+"""
+The approver inbox: the workflow steps waiting on a user right now.
+
+A step is current when it is pending, its expense is still awaiting a
+decision and no earlier step of the same expense is pending. The inbox reads
+the user's pending steps off the (approver, status, due_date) index in due
+order and drops the ones behind an earlier step with an indexed NOT EXISTS
+probe, so it never scans other approvers' steps.
+
+The nav badge count is cached per user. `bulk_transition` and the overdue
+sweep call `invalidate_counts` for every approver whose steps they touch
+once their transaction commits; APPROVAL_INBOX_COUNT_CACHE_TIMEOUT bounds
+how long an edit made any other way can leave a count stale. Invalidation
+only reaches other processes through a shared cache, so counts are only
+cached by default when CACHE_URL configures one.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from .models import ApprovalWorkflow
+
+COUNT_KEY = 'approval-inbox-count:{user_id}'
+OPEN_EXPENSE_STATUSES = ('submitted', 'pending')
+
+
+def active_steps():
+    """
+    Every step currently waiting on its approver
+    """
+    earlier = ApprovalWorkflow.objects.filter(
+        expense_id=OuterRef('expense_id'), status='pending', step_order__lt=OuterRef('step_order')
+    )
+    return (
+        ApprovalWorkflow.objects.filter(status='pending', expense__status__in=OPEN_EXPENSE_STATUSES)
+        .exclude(Exists(earlier))
+    )
+
+
+def current_steps(user):
+    return active_steps().filter(approver=user)
+
+
+def pending_count(user):
+    timeout = settings.APPROVAL_INBOX_COUNT_CACHE_TIMEOUT
+    if not timeout:
+        return current_steps(user).count()
+    
+    key = COUNT_KEY.format(user_id=user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = current_steps(user).count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def invalidate_counts(user_ids):
+    cache.delete_many([COUNT_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id])
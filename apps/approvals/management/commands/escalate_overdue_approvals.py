@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.approvals import escalation
+
+
+class Command(BaseCommand):
+    help = 'Escalate pending approval steps past their due date up the approver\'s manager chain'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=escalation.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+    
+    def handle(self, *args, **options):
+        # Steps handled by this run get due dates after `now`, so every step
+        # is claimed at most once per run
+        now = timezone.now()
+        claimed = escalated = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            batch_claimed, batch_escalated = escalation.escalate_batch(now, options['batch_size'])
+            if not batch_claimed:
+                break
+            claimed += batch_claimed
+            escalated += batch_escalated
+            batches += 1
+            self.stdout.write(f'Escalated {batch_escalated} of {batch_claimed} overdue steps')
+            if options['pause']:
+                time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Escalated {escalated} of {claimed} overdue steps in {batches} batches'
+        ))
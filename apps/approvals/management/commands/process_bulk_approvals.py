@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.approvals import bulk
+
+
+class Command(BaseCommand):
+    help = 'Run queued bulk approve/reject jobs in chunks, resuming interrupted ones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when idle')
+    
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            chunks = bulk.process_pending(options['chunk_size'])
+            total += chunks
+            if chunks:
+                self.stdout.write(f'Processed {chunks} chunks')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} chunks in total'))
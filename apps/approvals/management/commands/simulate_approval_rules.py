@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.approvals import simulation
+from apps.approvals.serializers import RuleSimulationSerializer
+from apps.companies.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Report per-approver load and auto-approve rates of past expenses under proposed approval rules'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', help='Company ID; repeat for several (default: all)')
+        parser.add_argument('--start', help='First submission date, YYYY-MM-DD (default: start of last quarter)')
+        parser.add_argument('--end', help='Last submission date, YYYY-MM-DD (default: end of last quarter)')
+        parser.add_argument(
+            '--proposal',
+            help='JSON file with "rules", "auto_approve_under_amount" and/or "require_approval_for_all"'
+        )
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    
+    def handle(self, *args, **options):
+        proposal = {}
+        if options['proposal']:
+            try:
+                with open(options['proposal']) as file:
+                    proposal = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+        for option in ('start', 'end'):
+            if options[option]:
+                proposal[option] = options[option]
+        
+        serializer = RuleSimulationSerializer(data=proposal)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+        data = serializer.validated_data
+        
+        company_ids = options['company'] or list(Company.objects.values_list('id', flat=True))
+        default_start, default_end = simulation.last_quarter()
+        report = simulation.simulate(
+            company_ids, data.get('start', default_start), data.get('end', default_end), data, options['workers']
+        )
+        self.stdout.write(json.dumps(report, indent=2, cls=DjangoJSONEncoder))
+        
+        current, proposed = report['scenarios']['current'], report['scenarios']['proposed']
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulated {report['expenses']} expenses: auto-approve rate "
+            f"{current['auto_approve_rate']:.1%} -> {proposed['auto_approve_rate']:.1%}"
+        ))
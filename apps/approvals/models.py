@@ -3,6 +3,23 @@ from django.utils import timezone
 from datetime import timedelta
 
 
+class ApprovalWorkflowQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Restrict to workflow steps on expenses `user` may see
+        """
+        from apps.accounts.models import UserHierarchy
+        
+        queryset = self.filter(company=user.company)
+        if user.role == 'employee':
+            return queryset.filter(expense__employee=user)
+        if user.role == 'manager':
+            return queryset.filter(
+                expense__employee_id__in=UserHierarchy.objects.filter(ancestor=user).values('descendant_id')
+            )
+        return queryset
+
+
 class ApprovalWorkflow(models.Model):
     """
     Approval workflow steps for expenses
@@ -16,6 +33,13 @@ class ApprovalWorkflow(models.Model):
     ]
     
     expense = models.ForeignKey('expenses.Expense', on_delete=models.CASCADE, related_name='approval_workflow')
+    # Copied from the expense so company-wide lists can be read in index order
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='approval_workflows',
+        editable=False
+    )
     approver = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='approval_workflows')
     step_order = models.PositiveIntegerField()  # Order in the approval chain
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -41,16 +65,36 @@ class ApprovalWorkflow(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ApprovalWorkflowQuerySet.as_manager()
+    
     class Meta:
         db_table = 'approval_workflows'
         verbose_name = 'Approval Workflow'
         verbose_name_plural = 'Approval Workflows'
         ordering = ['step_order']
         unique_together = ['expense', 'step_order']
+        indexes = [
+            models.Index(fields=['company', 'created_at', 'id']),
+            models.Index(fields=['company', 'due_date']),
+            models.Index(
+                fields=['company', 'created_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='approval_pending_created_idx',
+            ),
+            # Approver inbox (see inbox.py)
+            models.Index(fields=['approver', 'status', 'due_date', 'id']),
+            # Overdue sweeps (see escalation.py)
+            models.Index(fields=['due_date'], condition=models.Q(status='pending'), name='approval_pending_due_idx'),
+        ]
     
     def __str__(self):
         return f"{self.expense.id} - Step {self.step_order} - {self.approver.full_name}"
     
+    def save(self, *args, **kwargs):
+        if not self.company_id:
+            self.company_id = self.expense.company_id
+        super().save(*args, **kwargs)
+    
     def is_overdue(self):
         return self.status == 'pending' and timezone.now() > self.due_date
     
@@ -184,6 +228,10 @@ class BulkApproval(models.Model):
         verbose_name = 'Bulk Approval'
         verbose_name_plural = 'Bulk Approvals'
         ordering = ['-created_at']
+        indexes = [
+            # Workers pick the oldest unfinished job (see bulk.py)
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Bulk {self.action} by {self.approver.full_name} - {self.status}"
@@ -0,0 +1,13 @@
+from apps.core.pagination import KeysetPagination
+
+
+class ApprovalWorkflowCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ApprovalInboxPagination(KeysetPagination):
+    # Always keyset: a page-number count would walk the whole inbox
+    ordering = ('due_date', 'id')
+    
+    def is_cursor_request(self, request):
+        return True
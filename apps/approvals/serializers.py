@@ -15,12 +15,77 @@ class ApprovalHistorySerializer(serializers.ModelSerializer):
 
 
 class BulkApprovalSerializer(serializers.ModelSerializer):
+    expense_ids = serializers.ListField(child=serializers.CharField(max_length=20), allow_empty=False, max_length=50000)
+    
     class Meta:
         model = BulkApproval
         fields = '__all__'
+        read_only_fields = [
+            'company', 'approver', 'status', 'processed_count', 'success_count', 'failure_count',
+            'error_log', 'created_at', 'completed_at'
+        ]
+    
+    def validate_expense_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ApprovalInboxSerializer(serializers.ModelSerializer):
+    """
+    A current step with its expense inline. Expects the queryset from
+    ApprovalInboxView, which joins the expense, employee and category.
+    """
+    expense_description = serializers.CharField(source='expense.description', read_only=True)
+    expense_amount = serializers.DecimalField(source='expense.amount', max_digits=10, decimal_places=2, read_only=True)
+    expense_currency = serializers.CharField(source='expense.currency', read_only=True)
+    expense_date = serializers.DateField(source='expense.expense_date', read_only=True)
+    expense_status = serializers.CharField(source='expense.status', read_only=True)
+    employee = serializers.IntegerField(source='expense.employee_id', read_only=True)
+    employee_name = serializers.CharField(source='expense.employee.full_name', read_only=True)
+    category_name = serializers.CharField(source='expense.category.name', read_only=True)
+    is_overdue = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = ApprovalWorkflow
+        fields = [
+            'id', 'expense', 'expense_description', 'expense_amount', 'expense_currency', 'expense_date',
+            'expense_status', 'employee', 'employee_name', 'category_name', 'step_order', 'status',
+            'due_date', 'is_overdue', 'escalated_at', 'created_at'
+        ]
+        read_only_fields = fields
 
 
 class ApprovalTemplateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ApprovalTemplate
         fields = '__all__'
+
+
+class ProposedApprovalRuleSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=200)
+    priority = serializers.IntegerField(default=0)
+    amount_threshold = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True, default=None)
+    categories = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    departments = serializers.ListField(child=serializers.CharField(max_length=100), required=False, default=list)
+    employees = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    requires_manager_approval = serializers.BooleanField(default=True)
+    requires_finance_approval = serializers.BooleanField(default=False)
+    requires_admin_approval = serializers.BooleanField(default=False)
+
+
+class RuleSimulationSerializer(serializers.Serializer):
+    """
+    A proposed rule set and/or auto-approve settings; omitted parts keep the
+    company's current configuration
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    rules = ProposedApprovalRuleSerializer(many=True, required=False, allow_null=True, default=None)
+    auto_approve_under_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, allow_null=True, default=None
+    )
+    require_approval_for_all = serializers.BooleanField(required=False, allow_null=True, default=None)
+    
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError('start must not be after end')
+        return data
@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.companies.models import ApprovalRule, Department
+
+from . import rules
+
+
+@receiver(post_save, sender=ApprovalRule)
+@receiver(post_delete, sender=ApprovalRule)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_compiled_rules(sender, instance, raw=False, **kwargs):
+    # Departments are matched by name, so renaming one changes the rules too
+    if not raw:
+        rules.bump_version(instance.company_id)
+
+
+@receiver(m2m_changed, sender=ApprovalRule.categories.through)
+@receiver(m2m_changed, sender=ApprovalRule.departments.through)
+@receiver(m2m_changed, sender=ApprovalRule.employees.through)
+def invalidate_compiled_rule_members(sender, instance, action, **kwargs):
+    # The other side of these relations belongs to the same company
+    if action.startswith('post_'):
+        rules.bump_version(instance.company_id)
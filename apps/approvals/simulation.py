@@ -0,0 +1,253 @@
+"""
+What-if simulation of approval rule and auto-approve changes.
+
+Submitted expenses of a period are loaded into one pandas frame and split
+into (company, month) partitions that are routed in a process pool. Each
+partition is routed twice, as the submit transition routes it today and
+under the proposed configuration. Every expense gets the steps
+`rules.build_chains` would create from the highest priority matching rule,
+except, when the proposal sets `auto_approve_under_amount`, those under it
+(unless `require_approval_for_all` is set), which count as auto-approved.
+Submissions never auto-approve today, so the current scenario ignores the
+CompanySettings auto-approve fields. Rules are applied as boolean column
+masks, never row by row.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.companies.models import ApprovalRule
+from apps.expenses.models import Expense
+from apps.expenses.workers import map_in_pool
+
+from .rules import get_approvers
+
+COLUMNS = ['company_id', 'employee_id', 'employee__manager_id', 'employee__profile__department', 'category_id', 'amount', 'submission_date']
+LOAD_CHUNK_SIZE = 20000
+
+
+def last_quarter(today=None):
+    """
+    First and last day of the calendar quarter before `today`
+    """
+    today = today or date.today()
+    end = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1) - timedelta(days=1)
+    return date(end.year, end.month - 2, 1), end
+
+
+def load_expenses(company_ids, start, end):
+    """
+    Expenses submitted between `start` and `end` (inclusive) as a frame
+    """
+    rows = (
+        Expense.objects.filter(
+            company_id__in=company_ids,
+            submission_date__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            submission_date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+        .exclude(status='draft')
+        .order_by()
+        .values_list(*COLUMNS)
+        .iterator(chunk_size=LOAD_CHUNK_SIZE)
+    )
+    frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    frame = frame.rename(columns={'employee__manager_id': 'manager_id', 'employee__profile__department': 'department'})
+    frame['manager_id'] = frame['manager_id'].fillna(0).astype('int64')
+    frame['department'] = frame['department'].fillna('').str.lower()
+    frame['amount'] = frame['amount'].astype(float)
+    frame['month'] = pd.to_datetime(frame.pop('submission_date'), utc=True).dt.strftime('%Y-%m')
+    return frame
+
+
+def normalize_rule(rule):
+    threshold = rule.get('amount_threshold')
+    return {
+        'id': rule['id'],
+        'name': rule['name'],
+        'priority': rule.get('priority', 0),
+        'amount_threshold': None if threshold is None else float(threshold),
+        'categories': list(rule.get('categories') or []),
+        'departments': [name.lower() for name in rule.get('departments') or []],
+        'employees': list(rule.get('employees') or []),
+        'requires_manager_approval': rule.get('requires_manager_approval', True),
+        'requires_finance_approval': rule.get('requires_finance_approval', False),
+        'requires_admin_approval': rule.get('requires_admin_approval', False),
+    }
+
+
+def current_scenario(company_id):
+    """
+    The company's active rules as the submit transition applies them, with
+    no auto-approval
+    """
+    rules = {
+        rule.pk: {
+            **{field: getattr(rule, field) for field in (
+                'id', 'name', 'priority', 'amount_threshold', 'requires_manager_approval',
+                'requires_finance_approval', 'requires_admin_approval',
+            )},
+            'categories': [], 'departments': [], 'employees': [],
+        }
+        for rule in ApprovalRule.objects.filter(company_id=company_id, is_active=True)
+    }
+    for key, through, field in (
+        ('categories', ApprovalRule.categories.through, 'expensecategory_id'),
+        ('departments', ApprovalRule.departments.through, 'department__name'),
+        ('employees', ApprovalRule.employees.through, 'user_id'),
+    ):
+        for rule_id, value in through.objects.filter(approvalrule_id__in=rules).values_list('approvalrule_id', field):
+            rules[rule_id][key].append(value)
+    
+    return {
+        'rules': [normalize_rule(rule) for rule in rules.values()],
+        'auto_approve_under_amount': 0.0,
+        'require_approval_for_all': False,
+    }
+
+
+def proposed_scenario(current, proposal):
+    """
+    `current` with the rules and settings given in `proposal` replaced
+    """
+    scenario = dict(current)
+    if proposal.get('rules') is not None:
+        # Proposed rules tie-break on their position, as saved rules do on ID
+        scenario['rules'] = [
+            normalize_rule({**rule, 'id': position}) for position, rule in enumerate(proposal['rules'])
+        ]
+    if proposal.get('auto_approve_under_amount') is not None:
+        scenario['auto_approve_under_amount'] = float(proposal['auto_approve_under_amount'])
+    if proposal.get('require_approval_for_all') is not None:
+        scenario['require_approval_for_all'] = proposal['require_approval_for_all']
+    return scenario
+
+
+def route(frame, scenario, finance_id, admin_id):
+    """
+    Auto-approval flags, matched rule positions (-1 for none) and the three
+    approver columns (0 for no step) of every row in `frame`
+    """
+    # Same order as CompiledRules.compile
+    rules = sorted(scenario['rules'], key=lambda rule: (-rule['priority'], rule['name'], rule['id']))
+    amount = frame['amount'].to_numpy()
+    employee = frame['employee_id'].to_numpy()
+    
+    conditions = []
+    for rule in rules:
+        mask = np.ones(len(frame), dtype=bool)
+        if rule['amount_threshold'] is not None:
+            mask &= amount >= rule['amount_threshold']
+        for column, key in (('category_id', 'categories'), ('department', 'departments'), ('employee_id', 'employees')):
+            if rule[key]:
+                mask &= frame[column].isin(rule[key]).to_numpy()
+        conditions.append(mask)
+    # np.select takes the first true condition, i.e. the highest priority rule
+    matched = np.select(conditions, np.arange(len(rules)), default=-1) if rules else np.full(len(frame), -1)
+    auto = amount < scenario['auto_approve_under_amount']
+    if scenario['require_approval_for_all']:
+        auto[:] = False
+    matched = np.where(auto, -1, matched)
+    
+    # One row of requirement flags per rule plus an all-False row that -1 picks
+    flags = np.array([
+        [rule['requires_manager_approval'], rule['requires_finance_approval'], rule['requires_admin_approval']]
+        for rule in rules
+    ] + [[False, False, False]], dtype=bool)[matched]
+    
+    manager = frame['manager_id'].to_numpy()
+    first = np.where(flags[:, 0] & (manager != 0) & (manager != employee), manager, 0)
+    second = np.where(flags[:, 1] & (finance_id != 0) & (employee != finance_id) & (first != finance_id), finance_id, 0)
+    third = np.where(
+        flags[:, 2] & (admin_id != 0) & (employee != admin_id) & (first != admin_id) & (second != admin_id),
+        admin_id, 0
+    )
+    return auto, matched, rules, (first, second, third)
+
+
+def simulate_partition(partition):
+    """
+    Route one (company, month) partition under every scenario; runs in a
+    worker process and only returns plain counts
+    """
+    company_id, month, frame, scenarios, finance_id, admin_id = partition
+    results = {}
+    for name, scenario in scenarios.items():
+        auto, matched, rules, steps = route(frame, scenario, finance_id or 0, admin_id or 0)
+        approvers = np.concatenate(steps)
+        routed = (steps[0] != 0) | (steps[1] != 0) | (steps[2] != 0)
+        results[name] = {
+            'expenses': len(frame),
+            'auto_approved': int(auto.sum()),
+            'unrouted': int((~auto & ~routed).sum()),
+            'approvers': dict(zip(*(array.tolist() for array in np.unique(approvers[approvers != 0], return_counts=True)))),
+            'rules': {
+                rules[position]['name']: count
+                for position, count in zip(*(array.tolist() for array in np.unique(matched[matched >= 0], return_counts=True)))
+            },
+        }
+    return company_id, month, results
+
+
+def simulate(company_ids, start, end, proposal, workers=None):
+    """
+    Per-approver load and auto-approve rates of the expenses submitted between
+    `start` and `end` under the current and proposed configuration
+    """
+    frame = load_expenses(company_ids, start, end)
+    current = {company_id: current_scenario(company_id) for company_id in company_ids}
+    scenarios = {
+        company_id: {'current': scenario, 'proposed': proposed_scenario(scenario, proposal)}
+        for company_id, scenario in current.items()
+    }
+    approvers = get_approvers(company_ids)
+    partitions = [
+        (company_id, month, group, scenarios[company_id], *approvers[company_id])
+        for (company_id, month), group in frame.groupby(['company_id', 'month'], sort=True)
+    ]
+    
+    report = {name: {'months': {}, 'approvers': Counter(), 'rules': Counter()} for name in ('current', 'proposed')}
+    for company_id, month, results in map_in_pool(simulate_partition, partitions, workers):
+        for name, counts in results.items():
+            bucket = report[name]['months'].setdefault(month, Counter())
+            bucket.update({key: counts[key] for key in ('expenses', 'auto_approved', 'unrouted')})
+            report[name]['approvers'].update(counts['approvers'])
+            report[name]['rules'].update(counts['rules'])
+    
+    names = dict(
+        User.objects.filter(id__in={user_id for scenario in report.values() for user_id in scenario['approvers']})
+        .values_list('id', 'email')
+    )
+    return {
+        'start': start,
+        'end': end,
+        'expenses': len(frame),
+        'scenarios': {name: format_scenario(scenario, names) for name, scenario in report.items()},
+    }
+
+
+def format_scenario(scenario, names):
+    months = []
+    totals = Counter()
+    for month, counts in sorted(scenario['months'].items()):
+        totals.update(counts)
+        months.append({'month': month, **counts, 'auto_approve_rate': rate(counts)})
+    return {
+        'expenses': totals['expenses'],
+        'auto_approved': totals['auto_approved'],
+        'auto_approve_rate': rate(totals),
+        'unrouted': totals['unrouted'],
+        'approvers': [
+            {'approver': approver_id, 'email': names.get(approver_id), 'steps': steps}
+            for approver_id, steps in scenario['approvers'].most_common()
+        ],
+        'rules': [{'rule': name, 'matched': count} for name, count in scenario['rules'].most_common()],
+        'months': months,
+    }
+
+
+def rate(counts):
+    return round(counts['auto_approved'] / counts['expenses'], 4) if counts['expenses'] else 0.0
@@ -5,8 +5,12 @@ urlpatterns = [
     # Approval endpoints will be added here
     path('workflows/', views.ApprovalWorkflowListView.as_view(), name='approval-workflow-list'),
     path('workflows/<int:pk>/', views.ApprovalWorkflowDetailView.as_view(), name='approval-workflow-detail'),
+    path('inbox/', views.ApprovalInboxView.as_view(), name='approval-inbox'),
+    path('inbox/count/', views.ApprovalInboxCountView.as_view(), name='approval-inbox-count'),
     path('history/', views.ApprovalHistoryListView.as_view(), name='approval-history-list'),
     path('bulk/', views.BulkApprovalView.as_view(), name='bulk-approval'),
+    path('bulk/<int:pk>/', views.BulkApprovalDetailView.as_view(), name='bulk-approval-detail'),
+    path('simulate/', views.RuleSimulationView.as_view(), name='approval-rule-simulation'),
     path('templates/', views.ApprovalTemplateListView.as_view(), name='approval-template-list'),
     path('templates/<int:pk>/', views.ApprovalTemplateDetailView.as_view(), name='approval-template-detail'),
 ]
@@ -1,14 +1,22 @@
-from rest_framework import generics, filters
+from rest_framework import generics, filters, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
+from apps.core.conditional import ConditionalGetMixin
+from . import inbox, simulation
 from .models import ApprovalWorkflow, ApprovalHistory, BulkApproval, ApprovalTemplate
-from .serializers import ApprovalWorkflowSerializer, ApprovalHistorySerializer, BulkApprovalSerializer, ApprovalTemplateSerializer
+from .pagination import ApprovalInboxPagination, ApprovalWorkflowCursorPagination
+from .serializers import (
+    ApprovalWorkflowSerializer, ApprovalHistorySerializer, BulkApprovalSerializer, ApprovalTemplateSerializer,
+    ApprovalInboxSerializer, RuleSimulationSerializer
+)
 
 
 class ApprovalWorkflowListView(generics.ListCreateAPIView):
     serializer_class = ApprovalWorkflowSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ApprovalWorkflowCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'approver', 'expense__status']
     search_fields = ['expense__description', 'expense__id']
@@ -16,28 +24,12 @@ class ApprovalWorkflowListView(generics.ListCreateAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        user = self.request.user
-        
-        # Base queryset filtered by company
-        queryset = ApprovalWorkflow.objects.filter(expense__company=user.company)
-        
-        # Role-based filtering
-        if user.role == 'employee':
-            # Employees can only see approvals for their own expenses
-            queryset = queryset.filter(expense__employee=user)
-        elif user.role == 'manager':
-            # Managers can see approvals for their subordinates and their own
-            subordinate_ids = user.subordinates.values_list('id', flat=True)
-            queryset = queryset.filter(
-                models.Q(expense__employee=user) | 
-                models.Q(expense__employee_id__in=subordinate_ids)
-            )
-        # Admins can see all approvals in their company (already filtered by company)
-        
-        return queryset
+        # Employees see approvals on their own expenses, managers those of
+        # their whole reporting line and admins everything in their company
+        return ApprovalWorkflow.objects.visible_to(self.request.user)
 
 
-class ApprovalWorkflowDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ApprovalWorkflowDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ApprovalWorkflow.objects.all()
     serializer_class = ApprovalWorkflowSerializer
     permission_classes = [IsAuthenticated]
@@ -45,16 +37,91 @@ class ApprovalWorkflowDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
+class ApprovalInboxView(generics.ListAPIView):
+    """
+    The steps waiting on the current user right now, one per expense, most
+    urgent first
+    """
+    serializer_class = ApprovalInboxSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ApprovalInboxPagination
+    filter_backends = []
+    
+    def get_queryset(self):
+        return inbox.current_steps(self.request.user).select_related(
+            'expense', 'expense__employee', 'expense__category'
+        )
+
+
+class ApprovalInboxCountView(APIView):
+    """
+    Number of steps in the current user's inbox, for the nav badge
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response({'pending': inbox.pending_count(request.user)})
+
+
 class ApprovalHistoryListView(generics.ListAPIView):
     queryset = ApprovalHistory.objects.all()
     serializer_class = ApprovalHistorySerializer
     permission_classes = [IsAuthenticated]
 
 
-class BulkApprovalView(generics.CreateAPIView):
-    queryset = BulkApproval.objects.all()
+class BulkApprovalView(generics.ListCreateAPIView):
+    """
+    Queue a bulk approve or reject; the process_bulk_approvals worker runs it
+    in chunks and fills in the progress counters
+    """
     serializer_class = BulkApprovalSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return BulkApproval.objects.filter(approver=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        if request.user.role not in ('manager', 'admin'):
+            return Response(
+                {'error': 'Only managers and admins can approve or reject expenses'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+    
+    def perform_create(self, serializer):
+        serializer.save(company=self.request.user.company, approver=self.request.user)
+
+
+class BulkApprovalDetailView(generics.RetrieveAPIView):
+    serializer_class = BulkApprovalSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return BulkApproval.objects.filter(approver=self.request.user)
+
+
+class RuleSimulationView(APIView):
+    """
+    Replay the company's submitted expenses of a period (default: last
+    quarter) under proposed approval rules and auto-approve settings, and
+    report per-approver load and auto-approve rates next to the current
+    configuration
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can simulate approval rules'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = RuleSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        default_start, default_end = simulation.last_quarter()
+        report = simulation.simulate(
+            [request.user.company_id], data.get('start', default_start), data.get('end', default_end), data
+        )
+        return Response(report)
 
 
 class ApprovalTemplateListView(generics.ListCreateAPIView):
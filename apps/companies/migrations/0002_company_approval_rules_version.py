@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='approval_rules_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
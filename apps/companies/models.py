@@ -54,6 +54,9 @@ class Company(models.Model):
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
     
+    # Bumped on every approval rule change; keys the compiled rule cache
+    approval_rules_version = models.PositiveIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
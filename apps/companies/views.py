@@ -2,6 +2,7 @@ from rest_framework import generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from apps.core.conditional import ConditionalGetMixin
 from .models import Company, CompanySettings, Department, ExpenseCategory, ApprovalRule
 from .serializers import (
     CompanySerializer, CompanySettingsSerializer, DepartmentSerializer, 
@@ -15,7 +16,7 @@ class CompanyListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class CompanyDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CompanyDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticated]
@@ -33,7 +34,7 @@ class DepartmentListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class DepartmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DepartmentDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAuthenticated]
@@ -45,7 +46,7 @@ class ExpenseCategoryListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ExpenseCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseCategoryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ExpenseCategory.objects.all()
     serializer_class = ExpenseCategorySerializer
     permission_classes = [IsAuthenticated]
@@ -57,7 +58,7 @@ class ApprovalRuleListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ApprovalRuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ApprovalRuleDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ApprovalRule.objects.all()
     serializer_class = ApprovalRuleSerializer
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique tuple of columns.
+
+    Each page is fetched by comparing against the key of the last row of the
+    previous page instead of using OFFSET, so deep pages cost the same as the
+    first one. The count is only computed when `with_count` is requested.
+
+    Cursor mode is opt-in: requests that carry neither `cursor` nor
+    `pagination=cursor` are handed to `fallback_class` so existing page-number
+    clients keep working. In cursor mode `ordering` always wins over any
+    ordering requested through OrderingFilter.
+    """
+    ordering = ()
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'with_count'
+    fallback_class = PageNumberPagination
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_cursor_request(request):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view=view)
+        
+        self.fallback = None
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        
+        position, reverse = self.decode_cursor(request)
+        
+        self.count = None
+        if self.wants_count(request):
+            self.count = queryset.count()
+        
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(name) for name in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_keyset_filter(ordering, position))
+        
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        
+        self.page = rows
+        return rows
+    
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+    
+    def is_cursor_request(self, request):
+        return (
+            self.cursor_query_param in request.query_params or
+            request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+    
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+    
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def build_keyset_filter(self, ordering, position):
+        """
+        Expand `(a, b) < (x, y)` into `a < x OR (a = x AND b < y)` following
+        the direction of each ordering column
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal_prefix & Q(**{f'{field}__{lookup}': value})
+            equal_prefix &= Q(**{field: value})
+        return condition
+    
+    def encode_cursor(self, row, reverse):
+        position = [field.value_to_string(row) for field in self.fields]
+        data = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = [field.to_python(value) for field, value in zip(self.fields, data['p'])]
+            reverse = bool(data['r'])
+        except (TypeError, ValueError, KeyError, ValidationError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        
+        if len(position) != len(self.fields) or None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+    
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
@@ -0,0 +1,103 @@
+"""
+EXPLAIN checks for the queries a piece of code issues.
+
+`capture_plans` records every SELECT run inside it and `find_problems`
+explains each one, reporting full table scans and sorts the database has to
+do in a temporary structure because no index delivers the rows in order.
+SQLite plans are read from EXPLAIN QUERY PLAN; on PostgreSQL sequential
+scans and sorts are disabled for the EXPLAIN so any that remain in the plan
+are ones no index could avoid.
+"""
+import json
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?P<table>\w+)(?: AS \w+)?$')
+SQLITE_TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF |LAST TERM OF )?ORDER BY')
+
+
+class QueryPlan:
+    def __init__(self, sql, lines):
+        self.sql = sql
+        self.lines = lines
+        self.problems = []
+    
+    def __str__(self):
+        return '\n'.join([self.sql, *(f'    {line}' for line in self.lines)])
+
+
+@contextmanager
+def capture_plans(plans):
+    """
+    Append a QueryPlan to `plans` for every SELECT run inside the block
+    """
+    with CaptureQueriesContext(connection) as context:
+        yield
+    for query in context.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT'):
+            plans.append(explain(sql))
+
+
+def explain(sql):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = QueryPlan(sql, [row[3] for row in cursor.fetchall()])
+        for line in plan.lines:
+            match = SQLITE_FULL_SCAN.match(line)
+            if match:
+                plan.problems.append(f"full scan of {match['table']}")
+            elif SQLITE_TEMP_SORT.search(line):
+                plan.problems.append('temp-table sort')
+        return plan
+    
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # SET LOCAL needs a transaction; the caller's atomic block scopes it
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            try:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                root = cursor.fetchone()[0]
+            finally:
+                cursor.execute('RESET enable_seqscan')
+                cursor.execute('RESET enable_sort')
+        if isinstance(root, str):
+            root = json.loads(root)
+        nodes = [root[0]['Plan']]
+        plan = QueryPlan(sql, [])
+        while nodes:
+            node = nodes.pop()
+            plan.lines.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+            if node['Node Type'] == 'Seq Scan':
+                plan.problems.append(f"full scan of {node['Relation Name']}")
+            elif node['Node Type'] == 'Sort':
+                plan.problems.append('temp-table sort')
+            nodes.extend(node.get('Plans', []))
+        return plan
+    
+    raise NotImplementedError(f'Query plan checks do not support {connection.vendor}')
+
+
+def analyze():
+    """
+    Refresh the planner statistics so plans reflect the current data
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def find_problems(plans, allow=()):
+    """
+    The plans with problems other than those listed in `allow`
+    """
+    failing = []
+    for plan in plans:
+        plan.problems = [problem for problem in plan.problems if problem not in allow]
+        if plan.problems:
+            failing.append(plan)
+    return failing
@@ -0,0 +1,186 @@
+"""
+Every expense and approval list/filter combination must be served by an
+index: no full table scans, and no temp-table sorts on company-wide lists.
+See apps/core/queryplans.py.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.approvals.models import ApprovalWorkflow
+from apps.companies.models import Company, ExpenseCategory
+from apps.core import queryplans
+from apps.expenses import tags
+from apps.expenses.bulk import bulk_create_expenses
+from apps.expenses.models import Expense, ExpenseComment, ExpenseTag, ExpenseTagAssignment
+
+STATUSES = ['draft', 'submitted', 'pending', 'approved', 'approved', 'approved', 'rejected', 'cancelled']
+
+
+class QueryPlanTests(TestCase):
+    COMPANIES = 2
+    EMPLOYEES = 20
+    EXPENSES = 800
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixture = cls.seed(cls.COMPANIES, cls.EMPLOYEES, cls.EXPENSES)
+        queryplans.analyze()
+    
+    @classmethod
+    def seed(cls, companies, employees, expenses):
+        rng = random.Random(0)
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        today = date.today()
+        fixture = None
+        
+        for company_number in range(companies):
+            slug = f'plan-check-{suffix}-{company_number}'
+            company = Company.objects.create(
+                name=slug, slug=slug, email=f'{slug}@example.com', address_line_1='1 Main St',
+                city='City', state_province='State', postal_code='00000', country='US'
+            )
+            categories = ExpenseCategory.objects.bulk_create(
+                ExpenseCategory(company=company, name=f'Category {number}') for number in range(10)
+            )
+            tag_objects = ExpenseTag.objects.bulk_create(
+                ExpenseTag(company=company, name=f'Tag {number}') for number in range(12)
+            )
+            
+            def create_user(role, manager=None):
+                number = User.objects.filter(company=company).count()
+                username = f'{slug}-{role}-{number}'
+                return User.objects.create(
+                    username=username, email=f'{username}@example.com', role=role,
+                    company=company, manager=manager
+                )
+            
+            admin = create_user('admin')
+            managers = [create_user('manager', admin) for _ in range(max(employees // 10, 1))]
+            staff = [create_user('employee', managers[0])]
+            staff += [create_user('employee', rng.choice(managers)) for _ in range(employees - 1)]
+            
+            created = bulk_create_expenses(
+                Expense(
+                    employee=rng.choice(staff + managers),
+                    company=company,
+                    category=rng.choice(categories),
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    description='Seeded expense',
+                    merchant=f'Merchant {rng.randint(1, 300)}',
+                    expense_date=today - timedelta(days=rng.randint(0, 720)),
+                    status=rng.choice(STATUSES),
+                )
+                for _ in range(expenses)
+            )
+            # auto_now_add stamped the whole batch with the same time
+            for expense_date in {expense.expense_date for expense in created}:
+                Expense.objects.filter(company=company, expense_date=expense_date).update(
+                    submission_date=timezone.make_aware(datetime.combine(expense_date, time(12)))
+                )
+            
+            workflow_steps = []
+            for expense in created:
+                if expense.status == 'draft':
+                    continue
+                manager = expense.employee.manager or admin
+                workflow_steps.append(ApprovalWorkflow(
+                    expense=expense, company=company, approver=manager, step_order=1,
+                    status='pending' if expense.status in ('submitted', 'pending') else 'approved',
+                    due_date=timezone.now() + timedelta(hours=rng.randint(-72, 72)),
+                ))
+            ApprovalWorkflow.objects.bulk_create(workflow_steps, batch_size=1000)
+            
+            ExpenseComment.objects.bulk_create(
+                (
+                    ExpenseComment(
+                        expense=expense, author=rng.choice([expense.employee, admin]),
+                        content='Seeded comment', is_internal=rng.random() < 0.2
+                    )
+                    for expense in rng.sample(created, len(created) // 5)
+                    for _ in range(rng.randint(1, 4))
+                ),
+                batch_size=1000
+            )
+            
+            assignments = [
+                ExpenseTagAssignment(expense=expense, tag=tag, assigned_by=admin)
+                for expense in created
+                for tag in rng.sample(tag_objects, rng.choice([0, 0, 1, 1, 2, 3]))
+            ]
+            ExpenseTagAssignment.objects.bulk_create(assignments, batch_size=1000)
+            tags.refresh_tag_sets({assignment.expense_id for assignment in assignments})
+            
+            if fixture is None:
+                busy = ExpenseComment.objects.filter(expense__employee=staff[0]).values_list('expense_id', flat=True)
+                fixture = {
+                    'users': {'admin': admin, 'manager': managers[0], 'employee': staff[0]},
+                    'category': categories[0],
+                    'employee': staff[1],
+                    'expense_date': created[0].expense_date,
+                    'expense': busy.first(),
+                    'tags': [tag.name for tag in tag_objects[:2]],
+                }
+        return fixture
+    
+    def get_cases(self, fixture):
+        first_tag, second_tag = fixture['tags']
+        expense_filters = [
+            {},
+            {'status': 'approved'},
+            {'category': fixture['category'].pk},
+            {'employee': fixture['employee'].pk},
+            {'expense_date': fixture['expense_date'].isoformat()},
+            {'tags': first_tag},
+            {'tags': f'{first_tag},{second_tag}'},
+            {'tags_any': f'{first_tag},{second_tag}'},
+            {'tags_not': first_tag},
+        ]
+        workflow_filters = [{}, {'status': 'pending'}, {'expense__status': 'approved'}]
+        
+        for role, user in fixture['users'].items():
+            for params in expense_filters:
+                yield role, user, '/api/expenses/', params
+                yield role, user, '/api/expenses/', {**params, 'pagination': 'cursor'}
+                yield role, user, '/api/expenses/summary/', params
+            for ordering in ('amount', '-amount', 'expense_date', '-expense_date', 'submission_date'):
+                yield role, user, '/api/expenses/', {'ordering': ordering}
+            
+            for params in workflow_filters:
+                yield role, user, '/api/approvals/workflows/', params
+                yield role, user, '/api/approvals/workflows/', {**params, 'pagination': 'cursor'}
+            for ordering in ('due_date', '-due_date'):
+                yield role, user, '/api/approvals/workflows/', {'ordering': ordering}
+            yield role, user, '/api/approvals/inbox/', {}
+            
+            comments = f"/api/expenses/{fixture['expense']}/comments/"
+            yield role, user, comments, {}
+            yield role, user, comments, {'since': (timezone.now() - timedelta(days=1)).isoformat()}
+    
+    def get_allowed(self, role, params):
+        # Employee and manager lists cover one person's or one team's rows,
+        # and a team is several index ranges that have to be merged, so a
+        # sort of that bounded set is accepted. Tag filters are driven from
+        # the assignment index (see tags.filter_by_tags) and sort their
+        # matches the same way. Company-wide lists must come off an index in
+        # order.
+        if role != 'admin' or any(param.startswith('tags') for param in params):
+            return ('temp-table sort',)
+        return ()
+    
+    def test_list_queries_are_served_by_indexes(self):
+        client = APIClient()
+        for role, user, path, params in self.get_cases(self.fixture):
+            with self.subTest(role=role, path=path, params=params):
+                client.force_authenticate(user)
+                plans = []
+                with queryplans.capture_plans(plans):
+                    response = client.get(path, params, HTTP_HOST='localhost')
+                self.assertEqual(response.status_code, 200)
+                failing = queryplans.find_problems(plans, self.get_allowed(role, params))
+                self.assertFalse(failing, '\n'.join(f"{', '.join(plan.problems)}\n{plan}" for plan in failing))
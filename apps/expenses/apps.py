@@ -5,3 +5,9 @@ class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.expenses'
     verbose_name = 'Expenses'
+    
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        
+        post_migrate.connect(signals.install_search_index, sender=self)
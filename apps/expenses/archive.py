@@ -0,0 +1,120 @@
+"""
+Hot/cold archival of closed expenses.
+
+Approved, rejected and cancelled expenses that have not changed for
+EXPENSE_ARCHIVE_AFTER_DAYS are moved, with their receipts, comments, tag
+assignments, approval workflow, history, escalations and notifications,
+into ArchivedExpense rows. Each batch is copied and deleted in one
+transaction, claiming rows another archiver holds with skip-locked
+locks. Archived expenses stay readable through the expense detail
+endpoint and `?include_archived=true` exports.
+
+Employee counters keep including archived expenses. While a batch is
+being deleted the per-row signal handlers stand down (see `is_archiving`).
+"""
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.approvals.models import ApprovalHistory, ApprovalWorkflow, EscalationLog
+from apps.notifications.models import Notification
+
+from . import summary
+from .models import (
+    ArchivedExpense, Expense, ExpenseComment, ExpenseReceipt, ExpenseTagAssignment, ReceiptUpload
+)
+
+ARCHIVABLE_STATUSES = ['approved', 'rejected', 'cancelled']
+DEFAULT_BATCH_SIZE = 500
+
+RELATED_MODELS = {
+    'receipts': ExpenseReceipt,
+    'receipt_uploads': ReceiptUpload,
+    'comments': ExpenseComment,
+    'tag_assignments': ExpenseTagAssignment,
+    'approval_workflow': ApprovalWorkflow,
+    'approval_history': ApprovalHistory,
+    'escalation_logs': EscalationLog,
+}
+
+_archiving = ContextVar('expense_archiving', default=False)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+def get_cutoff(days=None):
+    days = settings.EXPENSE_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Expense.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def collect_related(expense_ids):
+    related = {expense_id: {} for expense_id in expense_ids}
+    for name, model in RELATED_MODELS.items():
+        for row in model.objects.filter(expense_id__in=expense_ids).order_by('pk').values():
+            related[row['expense_id']].setdefault(name, []).append(row)
+    
+    # Notifications point at the expense directly or through a workflow step
+    notifications = (
+        Notification.objects.filter(
+            Q(expense_id__in=expense_ids) | Q(approval_workflow__expense_id__in=expense_ids)
+        )
+        .annotate(archived_expense_id=Coalesce(F('expense_id'), F('approval_workflow__expense_id')))
+        .order_by('pk')
+    )
+    for row in notifications.values():
+        related[row.pop('archived_expense_id')].setdefault('notifications', []).append(row)
+    return related
+
+
+def archive_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Archive up to `batch_size` expenses closed before `cutoff`; returns how
+    many were moved
+    """
+    with transaction.atomic():
+        expense_ids = list(
+            archivable(cutoff)
+            .order_by('updated_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not expense_ids:
+            return 0
+        
+        rows = list(Expense.objects.filter(id__in=expense_ids).values())
+        related = collect_related(expense_ids)
+        ArchivedExpense.objects.bulk_create([
+            ArchivedExpense(
+                id=row['id'],
+                company_id=row['company_id'],
+                employee_id=row['employee_id'],
+                category_id=row['category_id'],
+                status=row['status'],
+                amount=row['amount'],
+                expense_date=row['expense_date'],
+                submission_date=row['submission_date'],
+                data=row,
+                related=related[row['id']],
+            )
+            for row in rows
+        ])
+        
+        token = _archiving.set(True)
+        try:
+            Expense.objects.filter(id__in=expense_ids).delete()
+        finally:
+            _archiving.reset(token)
+        for company_id in {row['company_id'] for row in rows}:
+            summary.bump_version(company_id)
+    return len(expense_ids)
@@ -0,0 +1,35 @@
+"""
+Set-based write paths for expenses.
+
+`Expense.save()` and the expense signal handlers do per-row bookkeeping
+(ID allocation, fingerprints, search indexing, employee counters). Code that inserts many expenses at once
+goes through `bulk_create_expenses` so that bookkeeping happens once per
+batch instead.
+"""
+from django.db import transaction
+
+from . import search, summary
+from .models import Expense, EmployeeExpenseCounter
+
+
+def bulk_create_expenses(expenses, batch_size=1000):
+    """
+    Insert unsaved expenses with a single block of IDs and index them
+    """
+    expenses = list(expenses)
+    pending = [expense for expense in expenses if not expense.id]
+    if pending:
+        for expense, expense_id in zip(pending, Expense.allocate_ids(len(pending))):
+            expense.id = expense_id
+    for expense in expenses:
+        expense.refresh_fingerprint()
+    
+    with transaction.atomic():
+        created = Expense.objects.bulk_create(expenses, batch_size=batch_size)
+        search.get_backend().index([expense.id for expense in created])
+        EmployeeExpenseCounter.objects.apply([(*expense.counter_state(), 1) for expense in created])
+    for expense in created:
+        expense._counted_state = expense.counter_state()
+    for company_id in {expense.company_id for expense in created}:
+        summary.bump_version(company_id)
+    return created
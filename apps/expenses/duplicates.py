@@ -0,0 +1,208 @@
+"""
+Duplicate expense detection.
+
+Two signals are used:
+
+- `Expense.fingerprint`: employee, amount, expense date and normalized
+  merchant, hashed; matched exactly with an index lookup
+- `ExpenseReceipt.perceptual_hash`: a 64-bit difference hash of the receipt
+  image. A re-photographed or re-encoded receipt hashes a few bits apart,
+  so images match within `MAX_IMAGE_DISTANCE` bits. That comparison runs
+  over the employee's own receipts, so its cost grows with their history
+  rather than the company's. Identical files also match on `content_hash`.
+
+`scan` backfills both for historical data, hashing receipt images in a
+process pool, and reports every group of identical fingerprints or image
+hashes; near image matches are reported per expense by `find_duplicates`.
+"""
+import io
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count
+from PIL import Image, ImageOps
+
+from .models import Expense, ExpenseReceipt
+from .workers import map_in_pool, local_path_or_bytes
+
+HASH_SIZE = 8
+# Differing bits, out of 64, up to which two receipt images count as the same
+MAX_IMAGE_DISTANCE = 10
+DEFAULT_CHUNK_SIZE = 2000
+IGNORED_STATUSES = ['cancelled']
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash of a PIL image, as 16 hex digits
+    """
+    image = ImageOps.exif_transpose(image).convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return f'{bits:016x}'
+
+
+def hamming_distance(first, second):
+    return bin(int(first, 16) ^ int(second, 16)).count('1')
+
+
+def hash_receipt_image(source):
+    """
+    Pool entry point: the perceptual hash of an image path or bytes, or ''
+    for anything Pillow cannot read (PDFs, corrupt uploads)
+    """
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        return perceptual_hash(image)
+    except Exception:
+        return ''
+
+
+def find_duplicates(expense):
+    """
+    Other expenses of the same employee that look like `expense`, as a list
+    of {'id', 'reasons'} dicts
+    """
+    if not expense.fingerprint:
+        expense.refresh_fingerprint()
+    
+    receipts = ExpenseReceipt.objects.filter(expense=expense)
+    content_hashes = [h for h in receipts.values_list('content_hash', flat=True) if h]
+    image_hashes = [h for h in receipts.values_list('perceptual_hash', flat=True) if h]
+    
+    matches = {}
+    candidates = (
+        Expense.objects.filter(employee_id=expense.employee_id, fingerprint=expense.fingerprint)
+        .exclude(pk=expense.pk)
+        .exclude(status__in=IGNORED_STATUSES)
+        .values_list('id', flat=True)
+    )
+    for expense_id in candidates:
+        matches.setdefault(expense_id, set()).add('fingerprint')
+    
+    other_receipts = (
+        ExpenseReceipt.objects.filter(expense__employee_id=expense.employee_id)
+        .exclude(expense_id=expense.pk)
+        .exclude(expense__status__in=IGNORED_STATUSES)
+    )
+    if content_hashes:
+        for expense_id in other_receipts.filter(content_hash__in=content_hashes).values_list('expense_id', flat=True):
+            matches.setdefault(expense_id, set()).add('receipt')
+    if image_hashes:
+        other_images = other_receipts.exclude(perceptual_hash='').values_list('expense_id', 'perceptual_hash')
+        for expense_id, image_hash in other_images.iterator():
+            if any(hamming_distance(image_hash, own) <= MAX_IMAGE_DISTANCE for own in image_hashes):
+                matches.setdefault(expense_id, set()).add('receipt_image')
+    
+    return [{'id': expense_id, 'reasons': sorted(reasons)} for expense_id, reasons in sorted(matches.items())]
+
+
+@dataclass
+class ScanResult:
+    fingerprints_updated: int = 0
+    receipts_hashed: int = 0
+    groups: list = field(default_factory=list)
+
+
+def backfill_fingerprints(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    updated = 0
+    fields = ['id', 'employee_id', 'amount', 'expense_date', 'merchant', 'fingerprint']
+    batch = []
+    for expense in queryset.only(*fields).order_by().iterator(chunk_size=chunk_size):
+        old = expense.fingerprint
+        expense.refresh_fingerprint()
+        if expense.fingerprint != old:
+            batch.append(expense)
+        if len(batch) >= chunk_size:
+            Expense.objects.bulk_update(batch, ['fingerprint'])
+            updated += len(batch)
+            batch = []
+    if batch:
+        Expense.objects.bulk_update(batch, ['fingerprint'])
+        updated += len(batch)
+    return updated
+
+
+def backfill_image_hashes(queryset, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    hashed = 0
+    receipts = queryset.filter(perceptual_hash='').exclude(file_type__icontains='pdf').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(receipts.filter(id__gt=last_id)[:chunk_size])
+        if not batch:
+            return hashed
+        last_id = batch[-1].id
+        
+        # Receipts sharing a blob share a file; hash each file once
+        by_file = {}
+        for receipt in batch:
+            by_file.setdefault(receipt.receipt_file.name, []).append(receipt)
+        names, jobs = [], []
+        for name, group in by_file.items():
+            try:
+                jobs.append(local_path_or_bytes(group[0].receipt_file))
+                names.append(name)
+            except (OSError, ValueError):
+                continue
+        
+        updated = []
+        for name, image_hash in zip(names, map_in_pool(hash_receipt_image, jobs, workers=workers)):
+            if not image_hash:
+                continue
+            for receipt in by_file[name]:
+                receipt.perceptual_hash = image_hash
+                updated.append(receipt)
+        ExpenseReceipt.objects.bulk_update(updated, ['perceptual_hash'])
+        hashed += len(updated)
+
+
+def scan(company=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Backfill fingerprints and receipt image hashes, then group likely
+    duplicates by employee
+    """
+    expenses = Expense.objects.all()
+    receipts = ExpenseReceipt.objects.all()
+    if company is not None:
+        expenses = expenses.filter(company=company)
+        receipts = receipts.filter(expense__company=company)
+    
+    result = ScanResult()
+    with transaction.atomic():
+        result.fingerprints_updated = backfill_fingerprints(expenses, chunk_size)
+    result.receipts_hashed = backfill_image_hashes(receipts, chunk_size, workers)
+    
+    active = expenses.exclude(status__in=IGNORED_STATUSES)
+    duplicate_keys = (
+        active.values('employee_id', 'fingerprint')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for key in duplicate_keys.iterator():
+        ids = active.filter(**{k: key[k] for k in ('employee_id', 'fingerprint')})
+        result.groups.append({
+            'reason': 'fingerprint',
+            'employee': key['employee_id'],
+            'expenses': sorted(ids.values_list('id', flat=True)),
+        })
+    
+    active_receipts = receipts.exclude(expense__status__in=IGNORED_STATUSES).exclude(perceptual_hash='')
+    duplicate_images = (
+        active_receipts.values('expense__employee_id', 'perceptual_hash')
+        .annotate(total=Count('expense_id', distinct=True))
+        .filter(total__gt=1)
+    )
+    for key in duplicate_images.iterator():
+        ids = active_receipts.filter(
+            expense__employee_id=key['expense__employee_id'], perceptual_hash=key['perceptual_hash']
+        ).values_list('expense_id', flat=True).distinct()
+        result.groups.append({
+            'reason': 'receipt_image',
+            'employee': key['expense__employee_id'],
+            'expenses': sorted(ids),
+        })
+    return result
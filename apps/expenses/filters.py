@@ -0,0 +1,43 @@
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .search import search_expenses
+from .tags import filter_by_tags
+
+
+class ExpenseTagFilter(filters.BaseFilterBackend):
+    """
+    Filter by tag names: `?tags=a,b` requires all of them, `?tags_any=a,b`
+    at least one and `?tags_not=a,b` none
+    """
+    max_tags = 20
+    
+    def get_names(self, request, param):
+        names = [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+        if len(names) > self.max_tags:
+            raise ValidationError({param: f'At most {self.max_tags} tags can be given'})
+        return names
+    
+    def filter_queryset(self, request, queryset, view):
+        all_tags = self.get_names(request, 'tags')
+        any_tags = self.get_names(request, 'tags_any')
+        no_tags = self.get_names(request, 'tags_not')
+        if not (all_tags or any_tags or no_tags):
+            return queryset
+        return filter_by_tags(queryset, request.user.company, all_tags, any_tags, no_tags)
+
+
+class ExpenseSearchFilter(filters.SearchFilter):
+    """
+    Full-text `?search=` through the configured expense search backend.
+
+    Results are ordered by relevance unless the client asked for an explicit
+    `?ordering=`, so this filter must run after OrderingFilter.
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        queryset = search_expenses(queryset, query)
+        if 'search_rank' in queryset.query.extra_select and api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('search_rank', '-submission_date')
+        return queryset
@@ -0,0 +1,221 @@
+"""
+Streaming CSV/XLSX import of expenses.
+
+Files are read in chunks of `chunk_size` rows. Each chunk is validated
+column-wise with pandas against the company's categories and limits, and
+the valid rows are inserted with `bulk_create_expenses`. Invalid rows are
+reported by their line number in the source file and never block the rest
+of the chunk.
+
+Dates must be ISO `YYYY-MM-DD`; other formats are ambiguous between day and
+month and are reported as invalid. XLSX date cells are read as ISO dates.
+"""
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from apps.accounts.models import User
+from apps.companies.models import ExpenseCategory, CompanySettings
+from .bulk import bulk_create_expenses
+from .models import Expense
+
+REQUIRED_COLUMNS = ['amount', 'category', 'description', 'expense_date']
+OPTIONAL_COLUMNS = [
+    'employee_email', 'currency', 'merchant', 'location', 'project_code',
+    'payment_method', 'notes', 'is_billable', 'client_name',
+]
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+DATE_FORMAT = '%Y-%m-%d'
+# Amounts must fit Expense.amount once rounded to cents
+_amount_field = Expense._meta.get_field('amount')
+AMOUNT_LIMIT = 10 ** (_amount_field.max_digits - _amount_field.decimal_places)
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_chunks(file, file_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield DataFrames of at most `chunk_size` rows with every cell as a string
+    """
+    if os.path.splitext(file_name)[1].lower() in ('.xlsx', '.xlsm'):
+        yield from _read_xlsx_chunks(file, chunk_size)
+    else:
+        yield from pd.read_csv(
+            file, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding='utf-8-sig'
+        )
+
+
+def _read_xlsx_chunks(file, chunk_size):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip() for cell in next(rows, [])]
+        buffer = []
+        for row in rows:
+            buffer.append([_cell_text(cell) for cell in row[:len(header)]])
+            if len(buffer) == chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def _cell_text(cell):
+    if cell is None:
+        return ''
+    if isinstance(cell, datetime) and cell.time() == time(0):
+        cell = cell.date()
+    if isinstance(cell, date):
+        return cell.isoformat()
+    return str(cell)
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+    
+    def add_errors(self, errors):
+        self.failed += len(errors)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+    
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+class ExpenseImporter:
+    """
+    Import expenses into `company` on behalf of `user`.
+
+    Rows without an `employee_email` belong to `user`. When `own_only` is set
+    every row must belong to `user`, which is how employees are restricted;
+    otherwise `employees` (a User queryset, default: the whole company)
+    limits whose expenses may be imported, which is how managers are.
+    """
+    def __init__(self, company, user, status='draft', own_only=False, chunk_size=DEFAULT_CHUNK_SIZE, employees=None):
+        self.company = company
+        self.user = user
+        self.status = status
+        self.own_only = own_only
+        self.chunk_size = chunk_size
+        self.allowed_employee_ids = None
+        if employees is not None:
+            self.allowed_employee_ids = set(employees.values_list('id', flat=True))
+        
+        categories = ExpenseCategory.objects.filter(company=company, is_active=True)
+        self.category_ids = {name.strip().lower(): pk for pk, name in categories.values_list('id', 'name')}
+        self.category_limits = {
+            pk: float(limit) for pk, limit in categories.values_list('id', 'max_amount') if limit is not None
+        }
+        settings = CompanySettings.objects.filter(company=company).first()
+        self.company_limit = float(settings.max_expense_amount) if settings else None
+        self.employee_ids = {
+            email.lower(): pk
+            for pk, email in User.objects.filter(company=company, is_active=True).values_list('id', 'email')
+        }
+        self.payment_methods = {value for value, _ in Expense.PAYMENT_METHOD_CHOICES}
+    
+    def run(self, file, file_name):
+        result = ImportResult()
+        offset = 0
+        for frame in read_chunks(file, file_name, self.chunk_size):
+            frame = frame.rename(columns=lambda name: str(name).strip().lower())
+            missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            
+            # Line numbers as the user sees them: 1-based, after the header row
+            frame.index = pd.RangeIndex(offset + 2, offset + 2 + len(frame))
+            offset += len(frame)
+            
+            valid, errors = self.validate(frame)
+            result.add_errors(errors)
+            if len(valid):
+                result.created += len(bulk_create_expenses(self.build_expenses(valid)))
+        return result
+    
+    def validate(self, frame):
+        """
+        Normalize a chunk and split it into valid rows and per-row errors
+        """
+        for column in OPTIONAL_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = ''
+        for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+            frame[column] = frame[column].fillna('').astype(str).str.strip()
+        
+        frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce')
+        frame['expense_date'] = pd.to_datetime(frame['expense_date'], format=DATE_FORMAT, errors='coerce')
+        frame['category_id'] = frame['category'].str.lower().map(self.category_ids)
+        frame['employee_email'] = frame['employee_email'].str.lower()
+        frame['employee_id'] = frame['employee_email'].map(self.employee_ids)
+        frame.loc[frame['employee_email'] == '', 'employee_id'] = self.user.pk
+        frame['payment_method'] = frame['payment_method'].str.lower().replace('', 'credit_card')
+        frame['currency'] = frame['currency'].str.upper().replace('', self.company.currency)
+        category_limit = frame['category_id'].map(self.category_limits)
+        
+        checks = [
+            (frame['amount'].isna(), 'amount is not a number'),
+            (frame['amount'] < 0.01, 'amount must be at least 0.01'),
+            (frame['amount'].round(2) >= AMOUNT_LIMIT, f'amount must be less than {AMOUNT_LIMIT:,}'),
+            (frame['expense_date'].isna(), 'expense_date must be a YYYY-MM-DD date'),
+            (frame['category_id'].isna(), 'unknown category'),
+            (frame['description'] == '', 'description is required'),
+            (frame['employee_id'].isna(), 'unknown employee_email'),
+            (~frame['payment_method'].isin(self.payment_methods), 'invalid payment_method'),
+            (frame['currency'].str.len() != 3, 'currency must be a 3-letter code'),
+            (category_limit.notna() & (frame['amount'] > category_limit), 'amount exceeds the category limit'),
+        ]
+        if self.company_limit is not None:
+            checks.append((frame['amount'] > self.company_limit, 'amount exceeds the company limit'))
+        if self.own_only:
+            checks.append((frame['employee_id'] != self.user.pk, 'you can only import your own expenses'))
+        elif self.allowed_employee_ids is not None:
+            checks.append((
+                frame['employee_id'].notna() & ~frame['employee_id'].isin(self.allowed_employee_ids),
+                'you can only import expenses of your reporting line'
+            ))
+        
+        invalid = pd.Series(False, index=frame.index)
+        messages = {}
+        for mask, message in checks:
+            mask = mask.fillna(False)
+            invalid |= mask
+            for line in frame.index[mask]:
+                messages.setdefault(line, []).append(message)
+        
+        errors = [{'row': int(line), 'errors': messages[line]} for line in sorted(messages)]
+        return frame[~invalid], errors
+    
+    def build_expenses(self, frame):
+        for row in frame.itertuples(index=False):
+            yield Expense(
+                employee_id=int(row.employee_id),
+                company=self.company,
+                amount=Decimal(str(row.amount)).quantize(Decimal('0.01')),
+                currency=row.currency,
+                category_id=int(row.category_id),
+                description=row.description,
+                expense_date=row.expense_date.date(),
+                merchant=row.merchant[:200],
+                location=row.location[:200],
+                project_code=row.project_code[:50],
+                payment_method=row.payment_method,
+                notes=row.notes,
+                is_billable=row.is_billable.lower() in TRUE_VALUES,
+                client_name=row.client_name[:200],
+                status=self.status,
+            )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.expenses import archive
+
+
+class Command(BaseCommand):
+    help = 'Move closed expenses older than EXPENSE_ARCHIVE_AFTER_DAYS into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Archive expenses unchanged for this many days')
+        parser.add_argument('--batch-size', type=int, default=archive.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        cutoff = archive.get_cutoff(options['days'])
+        total = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive.archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f'Archived {moved} expenses')
+            if options['pause']:
+                time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} expenses in {batches} batches'))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.expenses import receipts
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked receipt uploads abandoned for longer than RECEIPT_UPLOAD_EXPIRY_HOURS'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Delete uploads idle for this many hours')
+    
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        expired = receipts.expire_uploads(max_age)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {expired} abandoned uploads'))
@@ -0,0 +1,7 @@
+from apps.expenses import previews
+from apps.expenses.workers import ReceiptBatchCommand
+
+
+class Command(ReceiptBatchCommand):
+    help = 'Render thumbnails and previews for pending receipts in a process pool'
+    module = previews
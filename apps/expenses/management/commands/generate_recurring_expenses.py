@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.companies.models import Company
+from apps.expenses import recurring
+
+
+class Command(BaseCommand):
+    help = 'Create draft expenses for every due recurring template (run daily from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only generate for this company ID')
+        parser.add_argument('--date', help='Generate as of this date (YYYY-MM-DD, default: today)')
+        parser.add_argument('--chunk-size', type=int, default=recurring.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company'] is not None:
+            try:
+                company = Company.objects.get(pk=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError(f"Company {options['company']} not found")
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError(f"Invalid date {options['date']}")
+        
+        result = recurring.generate_due(company, today, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created} draft expenses from {result.templates} templates'
+        ))
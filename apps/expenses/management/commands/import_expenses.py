@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import User
+from apps.expenses.importers import ExpenseImporter, DEFAULT_CHUNK_SIZE
+from apps.expenses.models import Expense
+
+
+class Command(BaseCommand):
+    help = 'Bulk import expenses from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--user', required=True,
+            help='Email of the importing user; rows without employee_email belong to them'
+        )
+        parser.add_argument('--status', default='draft', help='Status given to imported expenses')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--report', help='Write the per-row error report to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.select_related('company').get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+        if not user.company:
+            raise CommandError(f'{user.email} does not belong to a company')
+        if options['status'] not in dict(Expense.STATUS_CHOICES):
+            raise CommandError(f"Invalid status {options['status']}")
+        
+        importer = ExpenseImporter(
+            user.company, user, status=options['status'], chunk_size=options['chunk_size']
+        )
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.run(file, options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump(result.as_dict(), report, indent=2)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Imported {result.created} expenses, {result.failed} rows failed')
+        )
@@ -0,0 +1,7 @@
+from apps.expenses import ocr
+from apps.expenses.workers import ReceiptBatchCommand
+
+
+class Command(ReceiptBatchCommand):
+    help = 'Run OCR over pending receipts in a process pool'
+    module = ocr
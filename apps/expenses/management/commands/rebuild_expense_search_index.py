@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.expenses import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the expense full-text search index'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        count = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} expenses with {backend.__class__.__name__}')
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.expenses import tags
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized tag set of every expense'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=tags.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count = tags.rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed tag sets for {count} expenses'))
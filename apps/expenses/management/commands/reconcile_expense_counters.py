@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.expenses.models import EmployeeExpenseCounter
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-employee expense counters from the expenses table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee', type=int, action='append', help='Only reconcile this user ID (repeatable)')
+
+    def handle(self, *args, **options):
+        fixed = EmployeeExpenseCounter.objects.reconcile(options['employee'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters for {fixed} employees'))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.companies.models import Company
+from apps.expenses import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Backfill duplicate-detection hashes and report likely duplicate expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only scan this company ID')
+        parser.add_argument('--chunk-size', type=int, default=duplicates.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Pool size (default: CPU count)')
+        parser.add_argument('--report', help='Write the duplicate groups to this JSON file')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company'] is not None:
+            try:
+                company = Company.objects.get(pk=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError(f"Company {options['company']} not found")
+        
+        result = duplicates.scan(company, chunk_size=options['chunk_size'], workers=options['workers'])
+        
+        for group in result.groups:
+            self.stdout.write(f"{group['reason']}: {', '.join(group['expenses'])}")
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump(result.groups, report, indent=2)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {result.fingerprints_updated} fingerprints, hashed {result.receipts_hashed} receipts, '
+            f'found {len(result.groups)} duplicate groups'
+        ))
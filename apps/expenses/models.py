@@ -1,6 +1,37 @@
-from django.db import models
+from django.db import connections, models, transaction, IntegrityError
+from django.db.models import Count, F, Max, IntegerField, Sum
+from django.db.models.functions import Cast, Substr
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+import hashlib
+import re
+import uuid
+
+
+# Trailing words ignored when comparing merchant names
+MERCHANT_SUFFIXES = {'inc', 'llc', 'ltd', 'co', 'corp', 'gmbh', 'plc', 'the'}
+
+
+class ExpenseQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Restrict to the expenses `user` may see: their own as an employee, their
+        whole reporting line as a manager, and the full company as an admin
+        """
+        from apps.accounts.models import UserHierarchy
+        
+        queryset = self.filter(company=user.company)
+        if user.role == 'employee':
+            return queryset.filter(employee=user)
+        if user.role == 'manager':
+            # The closure table has a depth-0 row for the manager themselves
+            return queryset.filter(
+                employee_id__in=UserHierarchy.objects.filter(ancestor=user).values('descendant_id')
+            )
+        return queryset
 
 
 class Expense(models.Model):
@@ -88,6 +119,16 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Hash of employee, amount, date and normalized merchant for duplicate lookups
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    
+    # Sorted tag IDs like |3|7|12|, maintained from ExpenseTagAssignment
+    tag_key = models.CharField(max_length=500, blank=True, editable=False, db_index=True)
+    
+    objects = ExpenseQuerySet.as_manager()
+    
+    COUNTER_FIELDS = ('employee_id', 'status', 'amount')
+    
     class Meta:
         db_table = 'expenses'
         verbose_name = 'Expense'
@@ -95,32 +136,343 @@ class Expense(models.Model):
         ordering = ['-submission_date']
         indexes = [
             models.Index(fields=['employee', 'status']),
-            models.Index(fields=['company', 'status']),
-            models.Index(fields=['expense_date']),
             models.Index(fields=['submission_date']),
+            # One per list filter, each ending in the default ordering so
+            # pages come straight off the index (see apps/core/tests/test_query_plans.py)
+            models.Index(fields=['company', 'submission_date', 'id']),
+            models.Index(fields=['company', 'status', 'submission_date', 'id']),
+            models.Index(fields=['company', 'expense_date', 'submission_date', 'id']),
+            models.Index(fields=['company', 'amount']),
+            models.Index(fields=['employee', 'submission_date', 'id']),
+            models.Index(fields=['category', 'submission_date', 'id']),
         ]
     
     def __str__(self):
         return f"{self.id} - {self.employee.full_name} - ${self.amount}"
     
+    @staticmethod
+    def format_id(year, number):
+        return f'EXP-{year}-{number:03d}'
+    
+    @staticmethod
+    def parse_id(expense_id):
+        _, year, number = expense_id.split('-')
+        return int(year), int(number)
+    
+    @staticmethod
+    def normalize_merchant(merchant):
+        words = re.sub(r'[^a-z0-9]+', ' ', (merchant or '').lower()).split()
+        while words and words[-1] in MERCHANT_SUFFIXES:
+            words.pop()
+        return ' '.join(words)
+    
+    @classmethod
+    def compute_fingerprint(cls, employee_id, amount, expense_date, merchant):
+        amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+        key = f'{employee_id}|{amount}|{expense_date}|{cls.normalize_merchant(merchant)}'
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    def refresh_fingerprint(self):
+        self.fingerprint = self.compute_fingerprint(
+            self.employee_id, self.amount, self.expense_date, self.merchant
+        )
+    
+    @classmethod
+    def allocate_ids(cls, count=1, year=None):
+        """
+        Reserve `count` unused expense IDs for `year`, in ascending order
+        """
+        year = year or timezone.now().year
+        return [cls.format_id(year, number) for number in ExpenseSequence.objects.reserve(year, count)]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in cls.COUNTER_FIELDS):
+            instance._counted_state = instance.counter_state()
+        return instance
+    
+    def counter_state(self):
+        """
+        The (employee_id, status, amount) triple EmployeeExpenseCounter tracks
+        """
+        return (self.employee_id, self.status, Decimal(str(self.amount)))
+    
     def save(self, *args, **kwargs):
         if not self.id:
-            # Generate custom ID
-            from django.utils import timezone
-            year = timezone.now().year
-            last_expense = Expense.objects.filter(
-                id__startswith=f'EXP-{year}'
-            ).order_by('-id').first()
-            
-            if last_expense:
-                last_number = int(last_expense.id.split('-')[-1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            self.id = Expense.allocate_ids(1)[0]
+        self.refresh_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
+        
+        with transaction.atomic():
+            old_state = None
+            if not self._state.adding:
+                old_state = getattr(self, '_counted_state', None) or Expense.objects.filter(
+                    pk=self.pk
+                ).values_list(*self.COUNTER_FIELDS).first()
+            super().save(*args, **kwargs)
             
-            self.id = f'EXP-{year}-{new_number:03d}'
+            # Keep the employee's counters in step with this write
+            new_state = self.counter_state()
+            if old_state is None or tuple(old_state) != new_state:
+                changes = [(*new_state, 1)]
+                if old_state is not None:
+                    changes.append((*old_state, -1))
+                EmployeeExpenseCounter.objects.apply(changes)
+        self._counted_state = new_state
+
+
+class ExpenseSequenceManager(models.Manager):
+    def reserve(self, year, count=1):
+        """
+        Reserve `count` expense numbers for `year` and return them.
+
+        Numbers are taken outside the caller's transaction, so a request that
+        creates expenses never holds the counter until it commits; numbers
+        reserved by a transaction that rolls back are skipped. PostgreSQL
+        uses a native sequence per year, other databases advance the counter
+        row on a separate connection. SQLite allows one writer per database
+        anyway, so there the counter is advanced in place.
+        """
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            return self._reserve_from_sequence(connection, year, count)
+        if connection.vendor == 'sqlite' or not connection.in_atomic_block:
+            return self._reserve_from_counter(year, count)
         
-        super().save(*args, **kwargs)
+        side = connections.create_connection(self.db)
+        try:
+            return self._reserve_on_connection(side, year, count)
+        finally:
+            side.close()
+    
+    def _reserve_from_counter(self, year, count):
+        with transaction.atomic(using=self.db):
+            updated = self.filter(year=year).update(last_value=F('last_value') + count)
+            if not updated:
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(year=year, last_value=self._legacy_high_water(year) + count)
+                except IntegrityError:
+                    # Another transaction created the counter first
+                    self.filter(year=year).update(last_value=F('last_value') + count)
+            last_value = self.filter(year=year).values_list('last_value', flat=True).get()
+        return list(range(last_value - count + 1, last_value + 1))
+    
+    def _reserve_on_connection(self, connection, year, count):
+        # `connection` is private to this call, so its commit releases the
+        # counter row straight away
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        connection.set_autocommit(False)
+        for attempt in range(2):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'UPDATE {table} SET last_value = last_value + %s WHERE year = %s', [count, year])
+                    if not cursor.rowcount:
+                        cursor.execute(
+                            f'INSERT INTO {table} (year, last_value) VALUES (%s, %s)',
+                            [year, self._legacy_high_water(year) + count],
+                        )
+                    cursor.execute(f'SELECT last_value FROM {table} WHERE year = %s', [year])
+                    last_value = cursor.fetchone()[0]
+                connection.commit()
+                return list(range(last_value - count + 1, last_value + 1))
+            except IntegrityError:
+                # Another connection created the counter first
+                connection.rollback()
+                if attempt:
+                    raise
+            except BaseException:
+                connection.rollback()
+                raise
+    
+    def _reserve_from_sequence(self, connection, year, count):
+        # nextval() is never rolled back, so concurrent requests only contend
+        # for the instant it takes
+        name = f'expense_id_seq_{year}'
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            if cursor.fetchone()[0] is None:
+                counter = self.filter(year=year).values_list('last_value', flat=True).first() or 0
+                start = max(counter, self._legacy_high_water(year)) + 1
+                try:
+                    with transaction.atomic(using=self.db):
+                        cursor.execute(
+                            f'CREATE SEQUENCE IF NOT EXISTS {connection.ops.quote_name(name)} START WITH {start:d}'
+                        )
+                except IntegrityError:
+                    # Another transaction created the sequence first
+                    pass
+            cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [name, count])
+            return sorted(row[0] for row in cursor.fetchall())
+    
+    def _legacy_high_water(self, year):
+        # Expenses created before the counter existed were numbered by scanning
+        # the table, so seed the counter past the highest number already used.
+        prefix = f'EXP-{year}-'
+        result = Expense.objects.filter(id__startswith=prefix).aggregate(
+            high_water=Max(Cast(Substr('id', len(prefix) + 1), IntegerField()))
+        )
+        return result['high_water'] or 0
+
+
+class ExpenseSequence(models.Model):
+    """
+    Per-year counter used to allocate expense IDs (PostgreSQL uses a native
+    sequence per year instead)
+    """
+    year = models.PositiveIntegerField(primary_key=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    
+    objects = ExpenseSequenceManager()
+    
+    class Meta:
+        db_table = 'expense_sequences'
+        verbose_name = 'Expense Sequence'
+        verbose_name_plural = 'Expense Sequences'
+    
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+
+class EmployeeExpenseCounterManager(models.Manager):
+    def apply(self, changes):
+        """
+        Apply (employee_id, status, amount, sign) changes as in-place
+        increments; call inside the transaction that changed the expenses
+        """
+        deltas = {}
+        for employee_id, status, amount, sign in changes:
+            delta = deltas.setdefault(employee_id, {})
+            field = f'{status}_count'
+            delta[field] = delta.get(field, 0) + sign
+            if status == 'approved':
+                delta['approved_amount'] = delta.get('approved_amount', Decimal('0')) + sign * Decimal(str(amount))
+        deltas = {
+            employee_id: {field: value for field, value in delta.items() if value}
+            for employee_id, delta in deltas.items()
+        }
+        deltas = {employee_id: delta for employee_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        existing = set(self.filter(employee_id__in=deltas).values_list('employee_id', flat=True))
+        missing = set(deltas) - existing
+        if missing:
+            # Employees without a counter row (expenses from before counters
+            # existed) are counted from their expenses, which already include
+            # this change
+            self.reconcile(missing)
+        # Employees with the same delta share one UPDATE
+        by_delta = {}
+        for employee_id, delta in deltas.items():
+            if employee_id in existing:
+                by_delta.setdefault(tuple(sorted(delta.items())), []).append(employee_id)
+        now = timezone.now()
+        for delta, employee_ids in by_delta.items():
+            self.filter(employee_id__in=employee_ids).update(
+                updated_at=now, **{field: F(field) + value for field, value in delta}
+            )
+    
+    def reconcile(self, employee_ids=None):
+        """
+        Recompute counters from the expenses themselves; returns the number of
+        employees whose counters had drifted
+        """
+        expenses = Expense.objects.order_by()
+        counters = self.all()
+        if employee_ids is not None:
+            expenses = expenses.filter(employee_id__in=employee_ids)
+            counters = counters.filter(employee_id__in=employee_ids)
+        
+        # Archived expenses still count
+        archived = ArchivedExpense.objects.order_by()
+        if employee_ids is not None:
+            archived = archived.filter(employee_id__in=employee_ids)
+        
+        actual = {}
+        for source in (expenses, archived):
+            totals = source.values('employee_id', 'status').annotate(count=Count('id'), total=Sum('amount'))
+            for row in totals:
+                counter = actual.setdefault(row['employee_id'], self.model(employee_id=row['employee_id']))
+                field = f"{row['status']}_count"
+                setattr(counter, field, getattr(counter, field) + row['count'])
+                if row['status'] == 'approved':
+                    counter.approved_amount += row['total']
+        
+        fields = [f'{status}_count' for status, _ in Expense.STATUS_CHOICES] + ['approved_amount']
+        now = timezone.now()
+        stale, seen = [], set()
+        for counter in counters:
+            seen.add(counter.employee_id)
+            expected = actual.get(counter.employee_id, self.model(employee_id=counter.employee_id))
+            if any(getattr(counter, field) != getattr(expected, field) for field in fields):
+                for field in fields:
+                    setattr(counter, field, getattr(expected, field))
+                counter.updated_at = now
+                stale.append(counter)
+        missing = [counter for employee_id, counter in actual.items() if employee_id not in seen]
+        
+        with transaction.atomic():
+            self.bulk_update(stale, fields + ['updated_at'], batch_size=1000)
+            self.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        return len(stale) + len(missing)
+
+
+class EmployeeExpenseCounter(models.Model):
+    """
+    Per-employee expense counts by status and approved total, maintained in
+    the same transaction as every expense write
+    """
+    employee = models.OneToOneField(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='expense_counter'
+    )
+    draft_count = models.PositiveIntegerField(default=0)
+    submitted_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    approved_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    approved_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = EmployeeExpenseCounterManager()
+    
+    class Meta:
+        db_table = 'employee_expense_counters'
+        verbose_name = 'Employee Expense Counter'
+        verbose_name_plural = 'Employee Expense Counters'
+    
+    def __str__(self):
+        return f"{self.employee_id}: {self.total_count} expenses"
+    
+    @property
+    def total_count(self):
+        return sum(getattr(self, f'{status}_count') for status, _ in Expense.STATUS_CHOICES)
+
+
+class ReceiptBlob(models.Model):
+    """
+    Receipt file content stored once per SHA-256 digest
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='expense_receipts/', max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'receipt_blobs'
+        verbose_name = 'Receipt Blob'
+        verbose_name_plural = 'Receipt Blobs'
+    
+    def __str__(self):
+        return self.sha256
 
 
 class ExpenseReceipt(models.Model):
@@ -128,28 +480,110 @@ class ExpenseReceipt(models.Model):
     Receipt attachments for expenses
     """
     expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='receipts')
-    receipt_file = models.FileField(upload_to='expense_receipts/')
+    receipt_file = models.FileField(upload_to='expense_receipts/', max_length=255)
     file_name = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
     file_type = models.CharField(max_length=100)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Shared content; identical receipts point at the same blob
+    blob = models.ForeignKey(
+        ReceiptBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='receipts'
+    )
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    
     # OCR Data (if available)
+    OCR_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    ocr_status = models.CharField(max_length=20, choices=OCR_STATUS_CHOICES, default='pending')
+    ocr_error = models.TextField(blank=True)
+    ocr_claimed_at = models.DateTimeField(null=True, blank=True)
+    ocr_processed_at = models.DateTimeField(null=True, blank=True)
     ocr_text = models.TextField(blank=True)
     ocr_confidence = models.FloatField(null=True, blank=True)
     merchant_from_ocr = models.CharField(max_length=200, blank=True)
     amount_from_ocr = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     date_from_ocr = models.DateField(null=True, blank=True)
     
+    # Downscaled derivatives, stored next to the original
+    PREVIEW_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('unsupported', 'Unsupported'),
+    ]
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default='pending')
+    preview_error = models.TextField(blank=True)
+    preview_claimed_at = models.DateTimeField(null=True, blank=True)
+    thumbnail_file = models.FileField(max_length=255, blank=True)
+    preview_file = models.FileField(max_length=255, blank=True)
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True)
+    
     class Meta:
         db_table = 'expense_receipts'
         verbose_name = 'Expense Receipt'
         verbose_name_plural = 'Expense Receipts'
+        indexes = [
+            models.Index(fields=['ocr_status', 'uploaded_at']),
+            models.Index(fields=['preview_status', 'uploaded_at']),
+        ]
     
     def __str__(self):
         return f"Receipt for {self.expense.id}"
 
 
+class ReceiptUpload(models.Model):
+    """
+    Resumable chunked upload of a receipt
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='receipt_uploads')
+    uploaded_by = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='receipt_uploads')
+    file_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=100)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    chunk_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    receipt = models.OneToOneField(
+        ExpenseReceipt,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'receipt_uploads'
+        verbose_name = 'Receipt Upload'
+        verbose_name_plural = 'Receipt Uploads'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Upload {self.id} for {self.expense_id} ({self.received_size}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
+
+
 class ExpenseComment(models.Model):
     """
     Comments on expenses for communication between employees and approvers
@@ -175,6 +609,9 @@ class ExpenseComment(models.Model):
         verbose_name = 'Expense Comment'
         verbose_name_plural = 'Expense Comments'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['expense', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.full_name} on {self.expense.id}"
@@ -184,7 +621,8 @@ class ExpenseTag(models.Model):
     """
     Tags for categorizing and filtering expenses
     """
-    name = models.CharField(max_length=50, unique=True)
+    company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name='expense_tags')
+    name = models.CharField(max_length=50)
     color = models.CharField(max_length=7, default='#6B7280')  # Hex color code
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -194,6 +632,7 @@ class ExpenseTag(models.Model):
         verbose_name = 'Expense Tag'
         verbose_name_plural = 'Expense Tags'
         ordering = ['name']
+        unique_together = ['company', 'name']
     
     def __str__(self):
         return self.name
@@ -213,9 +652,24 @@ class ExpenseTagAssignment(models.Model):
         verbose_name = 'Expense Tag Assignment'
         verbose_name_plural = 'Expense Tag Assignments'
         unique_together = ['expense', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'expense']),
+        ]
     
     def __str__(self):
         return f"{self.expense.id} - {self.tag.name}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            from .tags import tag_key
+            
+            if self.tag.company_id != self.expense.company_id:
+                raise ValidationError("Tags must belong to the expense's company")
+            # The expense's tag set must still fit in Expense.tag_key
+            tag_ids = [*ExpenseTagAssignment.objects.filter(expense_id=self.expense_id).values_list('tag_id', flat=True)]
+            if len(tag_key([*tag_ids, self.tag_id])) > Expense._meta.get_field('tag_key').max_length:
+                raise ValidationError('This expense has too many tags')
+        super().save(*args, **kwargs)
 
 
 class ExpenseTemplate(models.Model):
@@ -234,11 +688,79 @@ class ExpenseTemplate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Recurrence; drafts are generated for `employee` (or the creator)
+    FREQUENCY_CHOICES = [
+        ('none', 'Not Recurring'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('yearly', 'Yearly'),
+    ]
+    frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES, default='none')
+    employee = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='recurring_templates'
+    )
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    next_run_date = models.DateField(null=True, blank=True)
+    
     class Meta:
         db_table = 'expense_templates'
         verbose_name = 'Expense Template'
         verbose_name_plural = 'Expense Templates'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_date']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.company.name}"
+    
+    def save(self, *args, **kwargs):
+        if self.frequency != 'none':
+            self.start_date = self.start_date or timezone.now().date()
+            self.next_run_date = self.next_run_date or self.start_date
+        super().save(*args, **kwargs)
+
+
+class ArchivedExpenseQuerySet(ExpenseQuerySet):
+    pass
+
+
+class ArchivedExpense(models.Model):
+    """
+    Closed expense moved out of the hot tables, with its related rows.
+    The columns needed for scoping and filtering are kept; everything else
+    is stored as it was in `data` (the expense row) and `related` (receipts,
+    comments, workflow, history, notifications, ...)
+    """
+    id = models.CharField(max_length=20, primary_key=True)
+    company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name='archived_expenses')
+    employee = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='archived_expenses')
+    category = models.ForeignKey('companies.ExpenseCategory', on_delete=models.PROTECT, related_name='archived_expenses')
+    status = models.CharField(max_length=20, choices=Expense.STATUS_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    expense_date = models.DateField()
+    submission_date = models.DateTimeField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    related = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = ArchivedExpenseQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'archived_expenses'
+        verbose_name = 'Archived Expense'
+        verbose_name_plural = 'Archived Expenses'
+        ordering = ['-submission_date']
+        indexes = [
+            models.Index(fields=['company', 'submission_date', 'id']),
+            models.Index(fields=['employee', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.id} (archived)"
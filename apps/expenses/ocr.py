@@ -0,0 +1,194 @@
+"""
+Receipt OCR pipeline.
+
+Receipts are queued by their `ocr_status`: new receipts start as `pending`
+and `process_pending()` runs the configured engine over a batch of them
+through the shared batch loop in apps.expenses.workers. Receipts that share
+content (see apps.expenses.receipts) are only read once.
+
+The engine is `RECEIPT_OCR_ENGINE`, a dotted path to a BaseOCREngine
+subclass. There is no default: until one is configured, receipts stay
+`pending`. StubOCREngine makes up its results and is only meant for tests.
+"""
+import hashlib
+import logging
+import re
+from dataclasses import dataclass, asdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import search
+from .workers import ReceiptBatchJob, local_path_or_bytes
+
+DEFAULT_BATCH_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_RE = re.compile(r'(?:total|amount due|balance)[^\d]{0,20}(\d+[.,]\d{2})', re.IGNORECASE)
+DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})')
+
+
+@dataclass
+class OCRResult:
+    text: str = ''
+    confidence: float = None
+    merchant: str = ''
+    amount: Decimal = None
+    date: date = None
+
+
+class BaseOCREngine:
+    def extract(self, source):
+        """
+        Read a receipt from `source` (a path or bytes) and return an OCRResult
+        """
+        raise NotImplementedError
+    
+    @staticmethod
+    def read_bytes(source):
+        if isinstance(source, bytes):
+            return source
+        with open(source, 'rb') as file:
+            return file.read()
+
+
+class StubOCREngine(BaseOCREngine):
+    """
+    Deterministic engine for tests: the same bytes always produce the same
+    made-up result, without any OCR library. Never configure it in production.
+    """
+    merchants = ['Acme Travel', 'City Cabs', 'Grand Hotel', 'Corner Cafe', 'Office Depot']
+    
+    def extract(self, source):
+        digest = hashlib.sha256(self.read_bytes(source)).digest()
+        merchant = self.merchants[digest[0] % len(self.merchants)]
+        amount = Decimal(int.from_bytes(digest[1:4], 'big') % 50000 + 100) / 100
+        day = date(2000, 1, 1).toordinal() + int.from_bytes(digest[4:6], 'big') % 9000
+        receipt_date = date.fromordinal(day)
+        return OCRResult(
+            text=f'{merchant}\nDate {receipt_date.isoformat()}\nTotal {amount}',
+            confidence=round(0.5 + digest[6] / 512, 3),
+            merchant=merchant,
+            amount=amount,
+            date=receipt_date,
+        )
+
+
+class TesseractOCREngine(BaseOCREngine):
+    """
+    Tesseract through pytesseract; images only
+    """
+    def extract(self, source):
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError:
+            raise ImproperlyConfigured('TesseractOCREngine requires pytesseract')
+        
+        import io
+        image = Image.open(io.BytesIO(self.read_bytes(source)))
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        words = [word for word in data['text'] if word.strip()]
+        confidences = [float(conf) for conf in data['conf'] if float(conf) >= 0]
+        text = ' '.join(words)
+        result = parse_fields(text)
+        result.confidence = round(sum(confidences) / len(confidences) / 100, 3) if confidences else None
+        return result
+
+
+def parse_fields(text):
+    """
+    Pull merchant, total and date out of raw receipt text
+    """
+    result = OCRResult(text=text)
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if lines:
+        result.merchant = lines[0][:200]
+    match = AMOUNT_RE.search(text)
+    if match:
+        try:
+            result.amount = Decimal(match.group(1).replace(',', '.'))
+        except InvalidOperation:
+            pass
+    match = DATE_RE.search(text)
+    if match:
+        value = match.group(1)
+        for pattern in ('%Y-%m-%d', '%m/%d/%Y'):
+            try:
+                result.date = datetime.strptime(value, pattern).date()
+                break
+            except ValueError:
+                continue
+    return result
+
+
+def get_engine_path():
+    return getattr(settings, 'RECEIPT_OCR_ENGINE', '')
+
+
+def run_engine(job):
+    """
+    Pool entry point for an (engine path, source) job; returns a
+    (result dict, error message) pair
+    """
+    engine_path, source = job
+    try:
+        return asdict(import_string(engine_path)().extract(source)), ''
+    except Exception as e:
+        return None, f'{e.__class__.__name__}: {e}'
+
+
+class OCRBatchJob(ReceiptBatchJob):
+    status_field = 'ocr_status'
+    claimed_field = 'ocr_claimed_at'
+    update_fields = [
+        'ocr_status', 'ocr_error', 'ocr_processed_at', 'ocr_text', 'ocr_confidence',
+        'merchant_from_ocr', 'amount_from_ocr', 'date_from_ocr',
+    ]
+    run = staticmethod(run_engine)
+    
+    def __init__(self, engine_path):
+        self.engine_path = engine_path
+        self.now = timezone.now()
+    
+    def build_job(self, receipt):
+        return self.engine_path, local_path_or_bytes(receipt.receipt_file)
+    
+    def failure(self, error):
+        return None, error
+    
+    def apply(self, group, outcome):
+        result, error = outcome
+        for receipt in group:
+            receipt.ocr_processed_at = self.now
+            if result is None:
+                receipt.ocr_status = 'failed'
+                receipt.ocr_error = error
+                continue
+            receipt.ocr_status = 'completed'
+            receipt.ocr_error = ''
+            receipt.ocr_text = result['text']
+            receipt.ocr_confidence = result['confidence']
+            receipt.merchant_from_ocr = (result['merchant'] or '')[:200]
+            receipt.amount_from_ocr = result['amount']
+            receipt.date_from_ocr = result['date']
+    
+    def saved(self, receipts):
+        # OCR text is part of the expense search document
+        search.get_backend().index({receipt.expense_id for receipt in receipts})
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """
+    Run OCR over one batch of pending receipts; returns the number processed
+    """
+    engine_path = get_engine_path()
+    if not engine_path:
+        logger.warning('RECEIPT_OCR_ENGINE is not set; leaving receipts pending')
+        return 0
+    return OCRBatchJob(engine_path).process(batch_size, workers=workers)
@@ -0,0 +1,17 @@
+from apps.core.pagination import KeysetPagination
+
+
+class ExpenseCursorPagination(KeysetPagination):
+    ordering = ('-submission_date', '-id')
+
+
+class ExpenseCommentCursorPagination(KeysetPagination):
+    """
+    Comment threads read oldest first and have no page-number clients, so
+    they are always cursor paginated
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    
+    def is_cursor_request(self, request):
+        return True
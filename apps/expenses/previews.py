@@ -0,0 +1,136 @@
+"""
+Downscaled receipt derivatives for list and approval screens.
+
+For every receipt a small thumbnail and a medium preview are rendered as
+JPEG (PDFs from their first page) through the shared batch loop in
+apps.expenses.workers and stored next to the original as
+`<original>.thumb.jpg` and `<original>.preview.jpg`. The decoded image is
+also used to record the receipt's perceptual hash for duplicate detection.
+Originals are content-addressed, so derivative names are too, and they can
+be served as immutable.
+
+PDF rasterizing needs PyMuPDF or pdf2image; without either, PDFs are marked
+`unsupported` and clients fall back to the original.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .duplicates import perceptual_hash
+from .workers import ReceiptBatchJob, local_path_or_bytes
+
+DEFAULT_BATCH_SIZE = 50
+VARIANTS = {
+    'thumbnail': ('thumb', (240, 240)),
+    'preview': ('preview', (1024, 1024)),
+}
+JPEG_QUALITY = 80
+
+
+class UnsupportedReceipt(Exception):
+    pass
+
+
+def derivative_name(original_name, variant):
+    suffix, _ = VARIANTS[variant]
+    return f'{os.path.splitext(original_name)[0]}.{suffix}.jpg'
+
+
+def open_image(source, is_pdf):
+    data = source if isinstance(source, bytes) else None
+    if not is_pdf:
+        return Image.open(io.BytesIO(data) if data is not None else source)
+    
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if fitz is not None:
+        document = fitz.open(stream=data, filetype='pdf') if data is not None else fitz.open(source)
+        pixmap = document[0].get_pixmap(dpi=100)
+        return Image.open(io.BytesIO(pixmap.tobytes('png')))
+    
+    try:
+        from pdf2image import convert_from_bytes, convert_from_path
+    except ImportError:
+        raise UnsupportedReceipt('PDF rendering requires PyMuPDF or pdf2image')
+    if data is not None:
+        return convert_from_bytes(data, dpi=100, first_page=1, last_page=1)[0]
+    return convert_from_path(source, dpi=100, first_page=1, last_page=1)[0]
+
+
+def render_derivatives(job):
+    """
+    Pool entry point for a (source, is_pdf) job; returns
+    ({variant: jpeg bytes}, perceptual hash, status, error message)
+    """
+    source, is_pdf = job
+    try:
+        image = open_image(source, is_pdf)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image_hash = perceptual_hash(image)
+        rendered = {}
+        for variant, (_, size) in VARIANTS.items():
+            copy = image.copy()
+            copy.thumbnail(size)
+            buffer = io.BytesIO()
+            copy.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            rendered[variant] = buffer.getvalue()
+        return rendered, image_hash, 'completed', ''
+    except UnsupportedReceipt as e:
+        return {}, '', 'unsupported', str(e)
+    except Exception as e:
+        return {}, '', 'failed', f'{e.__class__.__name__}: {e}'
+
+
+def is_pdf(receipt):
+    return 'pdf' in receipt.file_type.lower() or receipt.receipt_file.name.lower().endswith('.pdf')
+
+
+def save_derivative(name, content):
+    # Names follow the content of the original, so an existing file is current
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    return name
+
+
+class PreviewBatchJob(ReceiptBatchJob):
+    status_field = 'preview_status'
+    claimed_field = 'preview_claimed_at'
+    update_fields = ['preview_status', 'preview_error', 'thumbnail_file', 'preview_file', 'perceptual_hash']
+    run = staticmethod(render_derivatives)
+    
+    def group_key(self, receipt):
+        # Derivative names follow the original's name
+        return receipt.receipt_file.name
+    
+    def build_job(self, receipt):
+        return local_path_or_bytes(receipt.receipt_file), is_pdf(receipt)
+    
+    def failure(self, error):
+        return {}, '', 'failed', error
+    
+    def apply(self, group, outcome):
+        rendered, image_hash, status, error = outcome
+        name = group[0].receipt_file.name
+        stored = {
+            variant: save_derivative(derivative_name(name, variant), content)
+            for variant, content in rendered.items()
+        }
+        for receipt in group:
+            receipt.preview_status = status
+            receipt.preview_error = error
+            receipt.thumbnail_file = stored.get('thumbnail', '')
+            receipt.preview_file = stored.get('preview', '')
+            receipt.perceptual_hash = image_hash or receipt.perceptual_hash
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """
+    Render derivatives for one batch of pending receipts; returns the number
+    processed
+    """
+    return PreviewBatchJob().process(batch_size, workers=workers)
@@ -0,0 +1,216 @@
+"""
+Content-addressed receipt storage and resumable chunked uploads.
+
+Receipt content is stored once per SHA-256 digest as a ReceiptBlob under
+`expense_receipts/<aa>/<digest><ext>`; every ExpenseReceipt with the same
+content points at the same blob and file, whichever expense it belongs to.
+
+Chunked uploads store each chunk as a separate part under
+`receipt_uploads/<upload id>/` in the default storage, so a resumed upload
+can land on any server. Each chunk is hashed as it arrives to check its
+checksum. SHA-256 state cannot be carried between requests, so the content
+digest is computed in the single pass that joins the parts when the last
+byte arrives; the result is stored as a blob unless one already exists and
+attached to the expense. Uploads abandoned for RECEIPT_UPLOAD_EXPIRY_HOURS
+are removed by `expire_uploads` (the expire_receipt_uploads command).
+"""
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExpenseReceipt, ReceiptBlob, ReceiptUpload
+
+READ_BLOCK_SIZE = 64 * 1024
+# Chunks and joined uploads larger than this are spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+UPLOAD_PREFIX = 'receipt_uploads'
+EXPIRE_BATCH_SIZE = 500
+
+
+class ChunkError(ValueError):
+    pass
+
+
+def blob_name(digest, file_name):
+    extension = os.path.splitext(file_name)[1].lower()[:10]
+    return f'expense_receipts/{digest[:2]}/{digest}{extension}'
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(READ_BLOCK_SIZE), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def get_or_store_blob(file, file_name, content_type, size, digest=None):
+    """
+    Return the blob for `file`'s content, storing it only if it is new
+    """
+    digest = digest or hash_file(file)
+    blob = ReceiptBlob.objects.filter(sha256=digest).first()
+    if blob is not None:
+        return blob
+    
+    stored_name = default_storage.save(blob_name(digest, file_name), File(file))
+    blob, created = ReceiptBlob.objects.get_or_create(
+        sha256=digest,
+        defaults={'file': stored_name, 'size': size, 'content_type': content_type},
+    )
+    if not created:
+        # Lost a race with an identical upload
+        default_storage.delete(stored_name)
+    return blob
+
+
+def store_receipt(expense, file, file_name, content_type, size, digest=None):
+    """
+    Attach `file` to `expense`, sharing storage with identical receipts;
+    `digest` is the content's SHA-256 when the caller already has it
+    """
+    if digest is None and hasattr(file, 'chunks'):
+        # Django upload: hash while the chunks stream past
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        file.seek(0)
+        digest = digest.hexdigest()
+    elif digest is None:
+        digest = hash_file(file)
+    
+    with transaction.atomic():
+        blob = get_or_store_blob(file, file_name, content_type, size, digest=digest)
+        return ExpenseReceipt.objects.create(
+            expense=expense,
+            receipt_file=blob.file.name,
+            file_name=file_name[:255],
+            file_size=size,
+            file_type=content_type[:100],
+            blob=blob,
+            content_hash=blob.sha256,
+        )
+
+
+def part_name(upload, index):
+    return f'{UPLOAD_PREFIX}/{upload.pk}/{index:06d}.part'
+
+
+def delete_parts(upload):
+    directory = f'{UPLOAD_PREFIX}/{upload.pk}'
+    try:
+        _, names = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def append_chunk(upload, stream, checksum=None):
+    """
+    Stream a chunk from `stream` into storage as the upload's next part.
+
+    The chunk is spooled and hashed as it arrives and only stored once its
+    size and optional `checksum` (a SHA-256 hex digest) check out. The
+    caller must hold a lock on `upload` and have checked the offset.
+    """
+    max_chunk = getattr(settings, 'RECEIPT_UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+    remaining = upload.total_size - upload.received_size
+    digest = hashlib.sha256()
+    written = 0
+    
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as chunk:
+        if stream is not None:
+            for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+                written += len(block)
+                if written > min(max_chunk, remaining):
+                    raise ChunkError('Chunk is larger than allowed or than the remaining upload')
+                digest.update(block)
+                chunk.write(block)
+        if checksum and checksum.lower() != digest.hexdigest():
+            raise ChunkError('Chunk checksum mismatch')
+        
+        if written:
+            # A part left by a chunk whose transaction rolled back is replaced
+            name = part_name(upload, upload.chunk_count)
+            default_storage.delete(name)
+            chunk.seek(0)
+            default_storage.save(name, File(chunk))
+    
+    upload.received_size += written
+    upload.chunk_count += 1
+    upload.save(update_fields=['received_size', 'chunk_count', 'updated_at'])
+    return written
+
+
+def finalize_upload(upload):
+    """
+    Turn a fully received upload into an ExpenseReceipt.
+
+    The parts are read back once, hashed as they are joined, and stored as
+    a blob unless one with the same content exists. The caller must hold a
+    lock on `upload` and have checked it is still uploading; the parts are
+    deleted once that transaction commits.
+    """
+    digest = hashlib.sha256()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as content:
+        for index in range(upload.chunk_count):
+            name = part_name(upload, index)
+            if not default_storage.exists(name):
+                # Empty chunks store no part
+                continue
+            with default_storage.open(name, 'rb') as part:
+                for block in iter(lambda: part.read(READ_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    content.write(block)
+        content.seek(0)
+        
+        with transaction.atomic():
+            receipt = store_receipt(
+                upload.expense, content, upload.file_name, upload.file_type, upload.total_size,
+                digest=digest.hexdigest(),
+            )
+            upload.receipt = receipt
+            upload.status = 'completed'
+            upload.save(update_fields=['receipt', 'status', 'updated_at'])
+    transaction.on_commit(lambda: delete_parts(upload))
+    return receipt
+
+
+def abort_upload(upload):
+    upload.status = 'aborted'
+    upload.save(update_fields=['status', 'updated_at'])
+    transaction.on_commit(lambda: delete_parts(upload))
+
+
+def expire_uploads(max_age=None):
+    """
+    Delete uploads left uploading or aborted for longer than `max_age`
+    (default RECEIPT_UPLOAD_EXPIRY_HOURS) with their parts; returns the
+    number deleted
+    """
+    if max_age is None:
+        max_age = timedelta(hours=getattr(settings, 'RECEIPT_UPLOAD_EXPIRY_HOURS', 24))
+    cutoff = timezone.now() - max_age
+    expired = 0
+    while True:
+        with transaction.atomic():
+            # Skip uploads a chunk request is writing to right now
+            uploads = list(
+                ReceiptUpload.objects.filter(status__in=['uploading', 'aborted'], updated_at__lt=cutoff)
+                .order_by('updated_at')
+                .select_for_update(skip_locked=True)[:EXPIRE_BATCH_SIZE]
+            )
+            if not uploads:
+                return expired
+            for upload in uploads:
+                delete_parts(upload)
+            ReceiptUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+        expired += len(uploads)
@@ -0,0 +1,121 @@
+"""
+Generation of draft expenses from recurring ExpenseTemplates.
+
+Due templates are claimed in chunks with row locks that other runs skip,
+missed occurrences up to the run date become drafts, and each chunk's
+drafts are inserted with one block of IDs while the templates' next run
+dates advance in the same transaction. A run creates at most
+`MAX_OCCURRENCES_PER_RUN` drafts per template; a template further behind
+stays due and catches up over the following runs. Re-running for the same
+date is a no-op.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import bulk_create_expenses
+from .models import Expense, ExpenseTemplate
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_OCCURRENCES_PER_RUN = 60
+# How far back a template's start date may be set
+MAX_BACKDATE = timedelta(days=366)
+MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+
+def add_months(day, months, anchor_day):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(template, day):
+    if template.frequency == 'weekly':
+        return day + timedelta(weeks=1)
+    # Clamp to short months without drifting: the 31st stays the 31st.
+    # Templates saved without a start date anchor on the day given.
+    anchor = template.start_date or day
+    return add_months(day, MONTHS[template.frequency], anchor.day)
+
+
+def occurrences(template, today, limit=MAX_OCCURRENCES_PER_RUN):
+    """
+    Dates of the first `limit` occurrences due by `today`, and the run date
+    after them
+    """
+    dates = []
+    day = template.next_run_date
+    while len(dates) < limit and day <= today and (template.end_date is None or day <= template.end_date):
+        dates.append(day)
+        day = next_occurrence(template, day)
+    return dates, day
+
+
+def build_draft(template, expense_date):
+    return Expense(
+        employee_id=template.employee_id or template.created_by_id,
+        company_id=template.company_id,
+        amount=template.amount,
+        currency=template.company.currency,
+        category_id=template.category_id,
+        description=template.description or template.name,
+        expense_date=expense_date,
+        merchant=template.merchant,
+        project_code=template.project_code,
+        status='draft',
+    )
+
+
+@dataclass
+class GenerationResult:
+    templates: int = 0
+    created: int = 0
+
+
+def due_templates(company=None, today=None):
+    templates = ExpenseTemplate.objects.filter(
+        is_active=True, next_run_date__lte=today or timezone.now().date(), amount__isnull=False
+    ).exclude(frequency='none')
+    if company is not None:
+        templates = templates.filter(company=company)
+    return templates
+
+
+def generate_due(company=None, today=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Create the drafts of every due template, optionally for one company
+    """
+    today = today or timezone.now().date()
+    result = GenerationResult()
+    # Templates that hit the per-run cap and are still due
+    behind = set()
+    while True:
+        with transaction.atomic():
+            templates = list(
+                due_templates(company, today)
+                .exclude(id__in=behind)
+                .select_related('company')
+                .order_by('next_run_date', 'id')
+                .select_for_update(skip_locked=True, of=('self',))[:chunk_size]
+            )
+            if not templates:
+                return result
+            
+            drafts = []
+            for template in templates:
+                dates, next_run = occurrences(template, today)
+                drafts.extend(build_draft(template, expense_date) for expense_date in dates)
+                # Finished schedules drop out of the due index
+                if template.end_date is not None and next_run > template.end_date:
+                    next_run = None
+                elif next_run <= today:
+                    behind.add(template.pk)
+                template.next_run_date = next_run
+            
+            bulk_create_expenses(drafts)
+            ExpenseTemplate.objects.bulk_update(templates, ['next_run_date'])
+        result.templates += len(templates)
+        result.created += len(drafts)
@@ -0,0 +1,300 @@
+"""
+Full-text search over expenses.
+
+The index covers description, merchant, notes, client_name and the OCR text
+of every receipt attached to the expense. It lives next to the expenses
+table (an FTS5 virtual table on SQLite, a tsvector column with a GIN index
+on PostgreSQL) and is kept current by the signal handlers in
+`apps.expenses.signals`. Bulk code paths that bypass signals call
+`get_backend().index(ids)` themselves.
+
+Set `EXPENSE_SEARCH_BACKEND` to a dotted path to force a backend; by
+default one is picked from the database engine.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, OperationalError
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+EXPENSE_ID_RE = re.compile(r'^EXP-\d', re.IGNORECASE)
+ROWID_ID_RE = re.compile(r'^EXP-(\d{4})-(\d{1,10})$')
+INDEX_BATCH_SIZE = 500
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query or '')
+
+
+def iter_documents(expense_ids):
+    """
+    Yield (expense_id, description, merchant, notes, client_name, ocr_text)
+    for the given expenses
+    """
+    from .models import Expense, ExpenseReceipt
+    
+    ocr_text = {}
+    for expense_id, text in ExpenseReceipt.objects.filter(
+        expense_id__in=expense_ids
+    ).exclude(ocr_text='').values_list('expense_id', 'ocr_text'):
+        ocr_text.setdefault(expense_id, []).append(text)
+    
+    for row in Expense.objects.filter(id__in=expense_ids).values_list(
+        'id', 'description', 'merchant', 'notes', 'client_name'
+    ):
+        yield row + (' '.join(ocr_text.get(row[0], [])),)
+
+
+def chunked(items, size=INDEX_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BaseSearchBackend:
+    """
+    Interface implemented by every expense search backend
+    """
+    def install(self):
+        """Create the index structures if they do not exist yet"""
+    
+    def index(self, expense_ids):
+        """(Re)index the given expenses, dropping any that no longer exist"""
+    
+    def remove(self, expense_ids):
+        """Drop the given expenses from the index"""
+    
+    def rebuild(self):
+        from .models import Expense
+        
+        self.install()
+        self.clear()
+        ids = Expense.objects.values_list('id', flat=True).iterator(chunk_size=INDEX_BATCH_SIZE)
+        count = 0
+        for batch in chunked(ids):
+            self.index(batch)
+            count += len(batch)
+        return count
+    
+    def clear(self):
+        """Empty the index"""
+    
+    def search(self, queryset, query):
+        """
+        Filter `queryset` to expenses matching `query`, annotated with a
+        `search_rank` where lower sorts first
+        """
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """
+    Unindexed fallback that scans with icontains
+    """
+    fields = ['description', 'merchant', 'notes', 'client_name', 'receipts__ocr_text']
+    
+    def search(self, queryset, query):
+        condition = Q()
+        for token in tokenize(query):
+            token_condition = Q()
+            for field in self.fields:
+                token_condition |= Q(**{f'{field}__icontains': token})
+            condition &= token_condition
+        return queryset.filter(condition).distinct()
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 virtual table ranked with bm25
+    """
+    table = 'expense_search'
+    # Column weights for bm25(): expense_id, description, merchant, notes, client_name, ocr_text
+    weights = (0.0, 10.0, 10.0, 2.0, 5.0, 1.0)
+    
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "expense_id UNINDEXED, description, merchant, notes, client_name, ocr_text, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+    
+    @staticmethod
+    def rowid(expense_id):
+        # FTS5 rows are keyed by integer rowid; derive a stable positive one
+        # from the EXP-YYYY-NNN ID so updates and deletes never scan the
+        # index. Any other ID gets None and a negative rowid on insert.
+        match = ROWID_ID_RE.match(expense_id)
+        if match is None:
+            return None
+        return int(match.group(1)) * 10 ** 10 + int(match.group(2))
+    
+    def index(self, expense_ids):
+        for batch in chunked(expense_ids):
+            self.remove(batch)
+            keyed, unkeyed = [], []
+            for document in iter_documents(batch):
+                rowid = self.rowid(document[0])
+                if rowid is None:
+                    unkeyed.append(document)
+                else:
+                    keyed.append((rowid,) + document)
+            with connection.cursor() as cursor:
+                if keyed:
+                    cursor.executemany(
+                        f"INSERT INTO {self.table} "
+                        "(rowid, expense_id, description, merchant, notes, client_name, ocr_text) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                        keyed,
+                    )
+                if unkeyed:
+                    # Count down from the lowest rowid so these never collide
+                    # with a derived one
+                    cursor.executemany(
+                        f"INSERT INTO {self.table} "
+                        "(rowid, expense_id, description, merchant, notes, client_name, ocr_text) "
+                        f"VALUES (min(coalesce((SELECT rowid FROM {self.table} ORDER BY rowid LIMIT 1), 0), 0) - 1, "
+                        "%s, %s, %s, %s, %s, %s)",
+                        unkeyed,
+                    )
+    
+    def remove(self, expense_ids):
+        for batch in chunked(expense_ids):
+            rowids, unkeyed = [], []
+            for expense_id in batch:
+                rowid = self.rowid(expense_id)
+                if rowid is None:
+                    unkeyed.append(expense_id)
+                else:
+                    rowids.append(rowid)
+            with connection.cursor() as cursor:
+                if rowids:
+                    placeholders = ', '.join(['%s'] * len(rowids))
+                    cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", rowids)
+                if unkeyed:
+                    placeholders = ', '.join(['%s'] * len(unkeyed))
+                    cursor.execute(f"DELETE FROM {self.table} WHERE expense_id IN ({placeholders})", unkeyed)
+    
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+    
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={'search_rank': f'bm25({self.table}, {weights})'},
+            tables=[self.table],
+            where=[f'{self.table}.expense_id = expenses.id', f'{self.table} MATCH %s'],
+            params=[match],
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted tsvector documents behind a GIN index, ranked with ts_rank
+    """
+    table = 'expense_search_documents'
+    
+    @property
+    def config(self):
+        return getattr(settings, 'EXPENSE_SEARCH_CONFIG', 'english')
+    
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "expense_id varchar(20) PRIMARY KEY REFERENCES expenses (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING GIN (document)"
+            )
+    
+    def index(self, expense_ids):
+        for batch in chunked(expense_ids):
+            self.remove(batch)
+            config = self.config
+            rows = [
+                (expense_id, config, description, config, merchant, config, notes,
+                 config, client_name, config, ocr_text)
+                for expense_id, description, merchant, notes, client_name, ocr_text
+                in iter_documents(batch)
+            ]
+            if rows:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f"INSERT INTO {self.table} (expense_id, document) SELECT %s, "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'C') || "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'B') || "
+                        "setweight(to_tsvector(%s::regconfig, %s), 'D')",
+                        rows,
+                    )
+    
+    def remove(self, expense_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE expense_id = ANY(%s)", [list(expense_ids)])
+    
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+    
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.extra(
+            # ts_rank grows with relevance; negate it so lower sorts first
+            select={'search_rank': f'-ts_rank({self.table}.document, to_tsquery(%s::regconfig, %s))'},
+            select_params=[self.config, tsquery],
+            tables=[self.table],
+            where=[
+                f'{self.table}.expense_id = expenses.id',
+                f'{self.table}.document @@ to_tsquery(%s::regconfig, %s)',
+            ],
+            params=[self.config, tsquery],
+        )
+
+
+def sqlite_has_fts5():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+    except OperationalError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'EXPENSE_SEARCH_BACKEND', '')
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        return SQLiteFTS5SearchBackend()
+    return LikeSearchBackend()
+
+
+def search_expenses(queryset, query):
+    """
+    Filter `queryset` by a free-text `query`, matching expense IDs directly
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    if EXPENSE_ID_RE.match(query):
+        return queryset.filter(id__startswith=query.upper())
+    return get_backend().search(queryset, query)
@@ -1,8 +1,217 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Expense
+from apps.approvals.models import ApprovalWorkflow
+from . import recurring
+from .models import ArchivedExpense, Expense, ExpenseComment, ExpenseReceipt, ExpenseTag, ExpenseTemplate, ReceiptUpload
+from .tags import parse_tag_key
+from .transitions import TRANSITIONS
+
+
+# Denormalized lookup columns that are not part of the API
+INTERNAL_EXPENSE_FIELDS = ['fingerprint', 'tag_key']
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
-        fields = '__all__'
+        exclude = INTERNAL_EXPENSE_FIELDS
+        read_only_fields = ['id', 'approved_by', 'approved_at', 'rejected_by', 'rejected_at']
+    
+    def validate_status(self, value):
+        # Later status changes go through the transition service
+        if self.instance is None and value not in ('draft', 'submitted'):
+            raise serializers.ValidationError('New expenses can only be created as draft or submitted')
+        return value
+
+
+class ArchivedExpenseSerializer(serializers.ModelSerializer):
+    """
+    An archived expense in the shape of ExpenseSerializer, plus `archived`
+    and `archived_at`
+    """
+    class Meta:
+        model = ArchivedExpense
+        fields = ['archived_at']
+    
+    def to_representation(self, instance):
+        data = {
+            field.name: instance.data.get(field.attname)
+            for field in Expense._meta.concrete_fields
+            if field.name not in INTERNAL_EXPENSE_FIELDS
+        }
+        return {**data, 'archived': True, **super().to_representation(instance)}
+
+
+class ExpenseTransitionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=sorted(TRANSITIONS))
+    comments = serializers.CharField(required=False, allow_blank=True, default='')
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class ExpenseBulkTransitionSerializer(ExpenseTransitionSerializer):
+    expense_ids = serializers.ListField(child=serializers.CharField(max_length=20), allow_empty=False, max_length=1000)
+
+
+class ExpenseApproverSerializer(serializers.ModelSerializer):
+    approver_name = serializers.CharField(source='approver.full_name', read_only=True)
+    
+    class Meta:
+        model = ApprovalWorkflow
+        fields = ['step_order', 'approver', 'approver_name', 'status', 'due_date']
+
+
+class ExpenseListSerializer(serializers.ModelSerializer):
+    """
+    Read-only list representation with display names resolved inline.
+    Expects the queryset from ExpenseListView, which joins the related rows.
+    """
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    category_color = serializers.CharField(source='category.color', read_only=True)
+    approved_by_name = serializers.CharField(source='approved_by.full_name', read_only=True, allow_null=True)
+    rejected_by_name = serializers.CharField(source='rejected_by.full_name', read_only=True, allow_null=True)
+    approvers = ExpenseApproverSerializer(source='approval_workflow', many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Expense
+        fields = [
+            'id', 'employee', 'employee_name', 'company', 'amount', 'currency', 'category',
+            'category_name', 'category_color', 'description', 'expense_date',
+            'submission_date', 'merchant', 'location', 'payment_method', 'tax_amount',
+            'tax_rate', 'status', 'priority', 'approved_by', 'approved_by_name',
+            'approved_at', 'rejected_by', 'rejected_by_name', 'rejected_at',
+            'rejection_reason', 'notes', 'project_code', 'is_billable', 'client_name',
+            'approvers', 'tags', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+    
+    def get_tags(self, obj):
+        return parse_tag_key(obj.tag_key)
+
+
+class ExpenseReceiptSerializer(serializers.ModelSerializer):
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExpenseReceipt
+        fields = [
+            'id', 'expense', 'receipt_file', 'file_name', 'file_size', 'file_type',
+            'content_hash', 'uploaded_at', 'ocr_status', 'ocr_error', 'ocr_processed_at',
+            'ocr_text', 'ocr_confidence', 'merchant_from_ocr', 'amount_from_ocr',
+            'date_from_ocr', 'preview_status', 'thumbnail_url', 'preview_url'
+        ]
+        read_only_fields = fields
+    
+    def _derivative_url(self, obj, variant):
+        if not getattr(obj, f'{variant}_file'):
+            return None
+        url = reverse('receipt-derivative', args=[obj.expense_id, obj.pk, variant])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_thumbnail_url(self, obj):
+        return self._derivative_url(obj, 'thumbnail')
+    
+    def get_preview_url(self, obj):
+        return self._derivative_url(obj, 'preview')
+
+
+class ReceiptOCRStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseReceipt
+        fields = [
+            'id', 'ocr_status', 'ocr_error', 'ocr_processed_at', 'ocr_confidence',
+            'merchant_from_ocr', 'amount_from_ocr', 'date_from_ocr'
+        ]
+        read_only_fields = fields
+
+
+class ExpenseTemplateSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = ExpenseTemplate
+        fields = [
+            'id', 'name', 'description', 'category', 'category_name', 'amount', 'merchant',
+            'project_code', 'is_active', 'frequency', 'employee', 'start_date', 'end_date',
+            'next_run_date', 'created_by', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['next_run_date', 'created_by', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        frequency = attrs.get('frequency', getattr(self.instance, 'frequency', 'none'))
+        amount = attrs.get('amount', getattr(self.instance, 'amount', None))
+        if frequency != 'none' and amount is None:
+            raise serializers.ValidationError({'amount': 'Recurring templates need an amount.'})
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date cannot be before the start date.'})
+        return attrs
+    
+    def validate_start_date(self, value):
+        if value is not None and value < timezone.now().date() - recurring.MAX_BACKDATE:
+            raise serializers.ValidationError('Start date cannot be more than a year in the past.')
+        return value
+    
+    def validate_employee(self, value):
+        if value is not None and value.company_id != self.context['request'].user.company_id:
+            raise serializers.ValidationError('Employee must belong to your company.')
+        return value
+    
+    def validate_category(self, value):
+        if value.company_id != self.context['request'].user.company_id:
+            raise serializers.ValidationError('Category must belong to your company.')
+        return value
+
+
+class ExpenseCommentSerializer(serializers.ModelSerializer):
+    author_name = serializers.CharField(source='author.full_name', read_only=True)
+    
+    class Meta:
+        model = ExpenseComment
+        fields = [
+            'id', 'expense', 'author', 'author_name', 'comment_type', 'content',
+            'is_internal', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['expense', 'author', 'created_at', 'updated_at']
+
+
+class ExpenseTagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseTag
+        fields = ['id', 'name', 'color', 'description', 'created_at']
+        read_only_fields = ['created_at']
+    
+    def validate_name(self, value):
+        tags = ExpenseTag.objects.filter(company=self.context['request'].user.company, name__iexact=value)
+        if self.instance is not None:
+            tags = tags.exclude(pk=self.instance.pk)
+        if tags.exists():
+            raise serializers.ValidationError('Your company already has a tag with this name.')
+        return value
+
+
+class ReceiptUploadSerializer(serializers.ModelSerializer):
+    receipt = ExpenseReceiptSerializer(read_only=True)
+    
+    class Meta:
+        model = ReceiptUpload
+        fields = [
+            'id', 'expense', 'file_name', 'file_type', 'total_size', 'received_size',
+            'chunk_count', 'status', 'receipt', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'expense', 'received_size', 'chunk_count', 'status', 'receipt',
+            'created_at', 'updated_at'
+        ]
+    
+    def validate_total_size(self, value):
+        max_size = getattr(settings, 'RECEIPT_MAX_FILE_SIZE', 25 * 1024 * 1024)
+        if value <= 0 or value > max_size:
+            raise serializers.ValidationError(f"Receipts must be between 1 byte and {max_size} bytes.")
+        return value
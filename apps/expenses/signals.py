@@ -0,0 +1,55 @@
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import search, summary, tags
+from .archive import is_archiving
+from .models import Expense, EmployeeExpenseCounter, ExpenseReceipt, ExpenseTagAssignment
+
+
+@receiver(post_save, sender=Expense)
+def index_expense(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Expense)
+def unindex_expense(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
+
+@receiver(post_delete, sender=Expense)
+def uncount_expense(sender, instance, origin=None, **kwargs):
+    # Expenses cascading from a deleted user or company take the counters
+    # with them, and archived expenses keep counting; everything else runs
+    # inside the deletion's transaction
+    if is_archiving() or (isinstance(origin, models.Model) and not isinstance(origin, Expense)):
+        return
+    state = getattr(instance, '_counted_state', None) or instance.counter_state()
+    EmployeeExpenseCounter.objects.apply([(*state, -1)])
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def invalidate_expense_summaries(sender, instance, raw=False, **kwargs):
+    if not raw and not is_archiving():
+        summary.bump_version(instance.company_id)
+
+
+@receiver(post_save, sender=ExpenseReceipt)
+@receiver(post_delete, sender=ExpenseReceipt)
+def index_receipt_expense(sender, instance, raw=False, **kwargs):
+    # Receipt OCR text is part of the expense's search document
+    if not raw and not is_archiving():
+        search.get_backend().index([instance.expense_id])
+
+
+@receiver(post_save, sender=ExpenseTagAssignment)
+@receiver(post_delete, sender=ExpenseTagAssignment)
+def refresh_expense_tag_set(sender, instance, raw=False, **kwargs):
+    if not raw and not is_archiving():
+        tags.refresh_tag_sets([instance.expense_id])
+
+
+def install_search_index(sender, **kwargs):
+    search.get_backend().install()
@@ -0,0 +1,109 @@
+"""
+Grouped expense totals for dashboards.
+
+`summarize` runs one GROUP BY over an already scoped and filtered expense
+queryset and rolls the groups up per status, category and month in Python.
+Results can be cached per user and query when EXPENSE_SUMMARY_CACHE_TIMEOUT
+is set. Cache keys embed a per-company version that every expense write
+bumps, and for managers a digest of their reporting line, so a cached
+summary never outlives the data or the scope it was computed from. That
+only holds when every process shares the cache (see CACHE_URL).
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+VERSION_KEY = 'expense-summary-version:{company_id}'
+
+
+def summarize(queryset):
+    rows = (
+        queryset.order_by()
+        .values('status', 'category_id', 'category__name', month=TruncMonth('expense_date'))
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    # Sorting the handful of groups here keeps the database from needing a
+    # second temp-table pass after the GROUP BY
+    rows = sorted(rows, key=lambda row: (row['month'], row['status'], row['category_id']))
+    
+    groups = []
+    rollups = {'by_status': {}, 'by_category': {}, 'by_month': {}}
+    totals = {'count': 0, 'total': Decimal('0')}
+    for row in rows:
+        month = row['month'].strftime('%Y-%m')
+        group = {
+            'status': row['status'],
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'month': month,
+            'count': row['count'],
+            'total': row['total'],
+        }
+        groups.append(group)
+        for rollup, key in (('by_status', row['status']), ('by_category', row['category_id']), ('by_month', month)):
+            bucket = rollups[rollup].setdefault(key, {'count': 0, 'total': Decimal('0')})
+            bucket['count'] += row['count']
+            bucket['total'] += row['total']
+        totals['count'] += row['count']
+        totals['total'] += row['total']
+    
+    by_category_names = {group['category']: group['category_name'] for group in groups}
+    return {
+        **totals,
+        'by_status': [{'status': key, **value} for key, value in rollups['by_status'].items()],
+        'by_category': [
+            {'category': key, 'category_name': by_category_names[key], **value}
+            for key, value in rollups['by_category'].items()
+        ],
+        'by_month': [{'month': key, **value} for key, value in rollups['by_month'].items()],
+        'groups': groups,
+    }
+
+
+def bump_version(company_id):
+    if not settings.EXPENSE_SUMMARY_CACHE_TIMEOUT:
+        return
+    key = VERSION_KEY.format(company_id=company_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def scope_digest(user):
+    """
+    Changes whenever the set of expenses `user` may see changes owner
+    """
+    from apps.accounts.models import UserHierarchy
+    
+    if user.role != 'manager':
+        return user.role
+    team = UserHierarchy.objects.filter(ancestor=user).order_by('descendant_id').values_list('descendant_id', flat=True)
+    return hashlib.sha256(','.join(map(str, team)).encode()).hexdigest()[:16]
+
+
+def get_cache_key(user, query_string):
+    version = cache.get(VERSION_KEY.format(company_id=user.company_id), 0)
+    digest = hashlib.sha256(query_string.encode()).hexdigest()[:16]
+    return f'expense-summary:{user.company_id}:{version}:{user.pk}:{scope_digest(user)}:{digest}'
+
+
+def cached_summary(user, query_string, queryset):
+    """
+    `summarize(queryset)`, served from the cache when
+    EXPENSE_SUMMARY_CACHE_TIMEOUT is set
+    """
+    timeout = settings.EXPENSE_SUMMARY_CACHE_TIMEOUT
+    if not timeout:
+        return summarize(queryset)
+    
+    key = get_cache_key(user, query_string)
+    summary = cache.get(key)
+    if summary is None:
+        summary = summarize(queryset)
+        cache.set(key, summary, timeout)
+    return summary
@@ -0,0 +1,113 @@
+"""
+Denormalized per-expense tag sets.
+
+Every expense stores the sorted IDs of its tags in `Expense.tag_key`, e.g.
+`|3|7|12|`, kept in sync with ExpenseTagAssignment by signal handlers. Tag
+filters then need no join per tag: the rows are driven by one lookup on the
+(tag, expense) assignment index and the remaining AND/NOT terms are checked
+against the expense row itself.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from . import summary
+from .models import Expense, ExpenseTag, ExpenseTagAssignment
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def tag_key(tag_ids):
+    tag_ids = sorted(set(tag_ids))
+    return f"|{'|'.join(str(tag_id) for tag_id in tag_ids)}|" if tag_ids else ''
+
+
+def parse_tag_key(key):
+    return [int(tag_id) for tag_id in key.strip('|').split('|')] if key else []
+
+
+def has_tag(tag_id):
+    return Q(tag_key__contains=f'|{tag_id}|')
+
+
+def refresh_tag_sets(expense_ids):
+    """
+    Recompute the tag set of each expense in `expense_ids`
+    """
+    expense_ids = list(expense_ids)
+    tags_by_expense = {expense_id: [] for expense_id in expense_ids}
+    assignments = ExpenseTagAssignment.objects.filter(expense_id__in=expense_ids).values_list('expense_id', 'tag_id')
+    for expense_id, tag_id in assignments:
+        tags_by_expense[expense_id].append(tag_id)
+    
+    by_key = {}
+    for expense_id, tag_ids in tags_by_expense.items():
+        by_key.setdefault(tag_key(tag_ids), []).append(expense_id)
+    changed = 0
+    max_length = Expense._meta.get_field('tag_key').max_length
+    for key, ids in by_key.items():
+        if len(key) > max_length:
+            raise ValueError(f'Expenses {ids} have more tags than tag_key can hold')
+        changed += Expense.objects.filter(id__in=ids).exclude(tag_key=key).update(tag_key=key, updated_at=timezone.now())
+    if changed:
+        companies = Expense.objects.filter(id__in=expense_ids).values_list('company_id', flat=True).distinct()
+        for company_id in companies:
+            summary.bump_version(company_id)
+
+
+def rebuild(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recompute every expense's tag set; returns the number of expenses checked
+    """
+    ids = list(Expense.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), chunk_size):
+        refresh_tag_sets(ids[start:start + chunk_size])
+    return len(ids)
+
+
+def resolve_tags(company, names):
+    """
+    Map `company`'s tag names (case-insensitive) to IDs, omitting unknown names
+    """
+    if not names:
+        return {}
+    query = Q()
+    for name in names:
+        query |= Q(name__iexact=name)
+    tag_names = ExpenseTag.objects.filter(query, company=company).values_list('name', 'id')
+    return {name.lower(): tag_id for name, tag_id in tag_names}
+
+
+def filter_by_tags(queryset, company, all_tags=(), any_tags=(), no_tags=()):
+    """
+    Expenses carrying every tag in `all_tags`, at least one of `any_tags` and
+    none of `no_tags`, all given as names of `company`'s tags
+    """
+    resolved = resolve_tags(company, [*all_tags, *any_tags, *no_tags])
+    
+    all_ids = [resolved.get(name.lower()) for name in all_tags]
+    if None in all_ids:
+        return queryset.none()
+    any_ids = [resolved[name.lower()] for name in any_tags if name.lower() in resolved]
+    if any_tags and not any_ids:
+        return queryset.none()
+    no_ids = [resolved[name.lower()] for name in no_tags if name.lower() in resolved]
+    
+    # Drive the query from the assignment index, then check the rest in-row
+    if all_ids:
+        driver = [all_ids[0]]
+    else:
+        driver = any_ids
+    if driver:
+        queryset = queryset.filter(
+            id__in=ExpenseTagAssignment.objects.filter(tag_id__in=driver).values('expense_id')
+        )
+    for tag_id in all_ids[1:]:
+        queryset = queryset.filter(has_tag(tag_id))
+    if all_ids and any_ids:
+        any_query = Q()
+        for tag_id in any_ids:
+            any_query |= has_tag(tag_id)
+        queryset = queryset.filter(any_query)
+    for tag_id in no_ids:
+        queryset = queryset.exclude(has_tag(tag_id))
+    return queryset
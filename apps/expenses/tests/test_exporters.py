@@ -0,0 +1,43 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from openpyxl import load_workbook
+
+from apps.expenses.exporters import EXPORT_COLUMNS, iter_csv, write_xlsx
+
+
+def make_row(description, amount=Decimal('10.00')):
+    row = dict.fromkeys((field for _, field in EXPORT_COLUMNS), '')
+    row.update(id='EXP-2026-001', amount=amount, description=description)
+    return tuple(row.values())
+
+
+class ExporterTests(SimpleTestCase):
+    def test_formulas_are_escaped(self):
+        rows = [make_row(text) for text in ('=HYPERLINK("x")', '+1', '-2', '@SUM(A1)', '\tx', 'Taxi')]
+        rows.append(make_row('Refund', amount=Decimal('-5.00')))
+        description = [header for header, _ in EXPORT_COLUMNS].index('Description')
+        amount = [header for header, _ in EXPORT_COLUMNS].index('Amount')
+        expected = ["'=HYPERLINK(\"x\")", "'+1", "'-2", "'@SUM(A1)", "'\tx", 'Taxi', 'Refund']
+        
+        lines = list(csv.reader(io.StringIO(''.join(iter_csv(rows)), newline='')))[1:]
+        self.assertEqual([line[description] for line in lines], expected)
+        self.assertEqual(lines[-1][amount], '-5.00')
+        
+        sheet = load_workbook(write_xlsx(rows)).active
+        cells = [row[description] for row in sheet.iter_rows(min_row=2, values_only=True)]
+        self.assertEqual(cells, expected)
+        
+        # XLSX reads carriage returns back as newlines, so check those in CSV
+        line = list(csv.reader(io.StringIO(''.join(iter_csv([make_row('\rx')])), newline='')))[1]
+        self.assertEqual(line[description], "'\rx")
+    
+    def test_xlsx_continues_on_new_sheets(self):
+        rows = [make_row(f'Expense {number}') for number in range(5)]
+        workbook = load_workbook(write_xlsx(rows, max_rows=3))
+        
+        self.assertEqual(workbook.sheetnames, ['Expenses', 'Expenses 2', 'Expenses 3'])
+        self.assertEqual([sheet.max_row for sheet in workbook.worksheets], [3, 3, 2])
+        self.assertEqual(workbook['Expenses 3']['A1'].value, 'ID')
@@ -0,0 +1,66 @@
+import io
+from datetime import date, datetime
+
+from django.test import TestCase
+from openpyxl import Workbook
+
+from apps.accounts.models import User
+from apps.companies.models import Company, ExpenseCategory
+from apps.expenses.importers import ExpenseImporter
+from apps.expenses.models import Expense
+
+
+class ExpenseImporterDateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(
+            name='Acme', slug='acme', email='acme@example.com', address_line_1='1 Main St',
+            city='City', state_province='State', postal_code='00000', country='US'
+        )
+        ExpenseCategory.objects.create(company=cls.company, name='Travel')
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='admin', company=cls.company)
+    
+    def run_import(self, file, file_name):
+        return ExpenseImporter(self.company, self.admin).run(file, file_name)
+    
+    def test_csv_dates_must_be_iso(self):
+        # The ambiguous row comes first so pandas cannot guess a format from it
+        csv = (
+            'amount,category,description,expense_date\n'
+            '10.00,Travel,Taxi,01/03/2026\n'
+            '12.50,Travel,Train,2026-01-02\n'
+            '8.00,Travel,Bus,2026-01-03\n'
+            '9.00,Travel,Tram,2026-02-30\n'
+        )
+        result = self.run_import(io.BytesIO(csv.encode()), 'expenses.csv')
+        
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            result.errors,
+            [
+                {'row': 2, 'errors': ['expense_date must be a YYYY-MM-DD date']},
+                {'row': 5, 'errors': ['expense_date must be a YYYY-MM-DD date']},
+            ],
+        )
+        self.assertEqual(
+            sorted(Expense.objects.values_list('expense_date', flat=True)),
+            [date(2026, 1, 2), date(2026, 1, 3)],
+        )
+    
+    def test_xlsx_date_cells(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['amount', 'category', 'description', 'expense_date'])
+        sheet.append([10, 'Travel', 'Taxi', datetime(2026, 1, 2)])
+        sheet.append([12.5, 'Travel', 'Train', '2026-01-03'])
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        
+        result = self.run_import(file, 'expenses.xlsx')
+        
+        self.assertEqual((result.created, result.errors), (2, []))
+        self.assertEqual(
+            sorted(Expense.objects.values_list('expense_date', flat=True)),
+            [date(2026, 1, 2), date(2026, 1, 3)],
+        )
@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.approvals import rules
+from apps.approvals.models import ApprovalWorkflow
+from apps.companies.models import ApprovalRule, Company, ExpenseCategory
+
+from apps.expenses import transitions
+from apps.expenses.bulk import bulk_create_expenses
+from apps.expenses.models import Expense, ExpenseReceipt
+
+
+class ExpenseListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(
+            name='Acme', slug='acme', email='acme@example.com', address_line_1='1 Main St',
+            city='City', state_province='State', postal_code='00000', country='US'
+        )
+        cls.category = ExpenseCategory.objects.create(company=cls.company, name='Travel')
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='admin', company=cls.company)
+        cls.manager = User.objects.create(
+            username='manager', email='manager@example.com', role='manager', company=cls.company, manager=cls.admin
+        )
+    
+    def seed(self, count):
+        first = User.objects.count()
+        employees = [
+            User.objects.create(
+                username=f'employee-{number}', email=f'employee-{number}@example.com',
+                role='employee', company=self.company, manager=self.manager
+            )
+            for number in range(first, first + count)
+        ]
+        expenses = bulk_create_expenses(
+            Expense(
+                employee=employee, company=self.company, category=self.category, amount=10,
+                description='Taxi', expense_date=date.today(), status='pending'
+            )
+            for employee in employees
+        )
+        due_date = timezone.now() + timedelta(days=2)
+        ApprovalWorkflow.objects.bulk_create(
+            ApprovalWorkflow(expense=expense, company=self.company, approver=approver, step_order=step, due_date=due_date)
+            for expense in expenses
+            for step, approver in enumerate((self.manager, self.admin), 1)
+        )
+        ExpenseReceipt.objects.bulk_create(
+            ExpenseReceipt(
+                expense=expense, receipt_file=f'expense_receipts/{expense.pk}.pdf', file_name=f'{expense.pk}.pdf',
+                file_size=100, file_type='application/pdf'
+            )
+            for expense in expenses
+        )
+    
+    def count_list_queries(self, params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/expenses/', params, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data['results']
+    
+    def test_query_count_does_not_grow_with_rows(self):
+        for params in ({}, {'pagination': 'cursor'}):
+            with self.subTest(params=params):
+                self.seed(5)
+                small, small_rows = self.count_list_queries({**params, 'page_size': 100})
+                self.seed(5)
+                large, large_rows = self.count_list_queries({**params, 'page_size': 100})
+                self.assertEqual(len(large_rows), len(small_rows) + 5)
+                self.assertEqual(small, large)
+    
+    def test_list_resolves_names_and_approvers(self):
+        self.seed(1)
+        _, rows = self.count_list_queries({})
+        row = rows[0]
+        self.assertEqual(row['category_name'], 'Travel')
+        self.assertEqual([step['approver_name'] for step in row['approvers']], [self.manager.full_name, self.admin.full_name])
+        self.assertEqual(row['company'], self.company.pk)
+    
+    def test_list_shows_only_current_approvers(self):
+        # Compiled rules are cached on company ID and rules version, which
+        # repeat between test cases
+        rules._compiled.clear()
+        ApprovalRule.objects.create(company=self.company, name='Managers', rule_type='amount_threshold')
+        employee = User.objects.create(
+            username='resubmitter', email='resubmitter@example.com', role='employee',
+            company=self.company, manager=self.manager
+        )
+        expense = Expense.objects.create(
+            employee=employee, company=self.company, category=self.category, amount=10,
+            description='Taxi', expense_date=date.today()
+        )
+        for action in ('submit', 'cancel', 'reopen', 'submit'):
+            transitions.transition(expense, action, employee)
+        
+        _, rows = self.count_list_queries({})
+        approvers = next(row['approvers'] for row in rows if row['id'] == expense.pk)
+        self.assertEqual([(step['approver'], step['status']) for step in approvers], [(self.manager.pk, 'pending')])
@@ -0,0 +1,66 @@
+from threading import Thread
+from unittest import skipIf
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from apps.expenses.models import Expense, ExpenseSequence
+
+
+class ExpenseSequenceTests(TestCase):
+    def test_interleaved_reservations_never_overlap(self):
+        reserved = []
+        reserved += ExpenseSequence.objects.reserve(2030, 3)
+        with transaction.atomic():
+            reserved += ExpenseSequence.objects.reserve(2030, 1)
+            with transaction.atomic():
+                reserved += ExpenseSequence.objects.reserve(2030, 5)
+            reserved += ExpenseSequence.objects.reserve(2030, 2)
+        reserved += ExpenseSequence.objects.reserve(2030, 1)
+        
+        self.assertEqual(len(reserved), 12)
+        self.assertEqual(len(set(reserved)), 12)
+        self.assertEqual(reserved, sorted(reserved))
+    
+    def test_years_are_numbered_separately(self):
+        self.assertEqual(Expense.allocate_ids(2, year=2031), ['EXP-2031-001', 'EXP-2031-002'])
+        self.assertEqual(Expense.allocate_ids(1, year=2032), ['EXP-2032-001'])
+        self.assertEqual(Expense.allocate_ids(1, year=2031), ['EXP-2031-003'])
+    
+    def test_rolled_back_reservations_are_not_handed_out_twice(self):
+        first = ExpenseSequence.objects.reserve(2033, 2)
+        try:
+            with transaction.atomic():
+                ExpenseSequence.objects.reserve(2033, 2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(set(first) & set(ExpenseSequence.objects.reserve(2033, 2)))
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite allows one writer at a time')
+class ConcurrentExpenseSequenceTests(TransactionTestCase):
+    THREADS = 8
+    RESERVATIONS = 20
+    
+    def test_concurrent_reservations_never_overlap(self):
+        results = [[] for _ in range(self.THREADS)]
+        
+        def reserve(numbers):
+            try:
+                for size in range(1, self.RESERVATIONS + 1):
+                    # Hold the caller's transaction open around each reservation
+                    with transaction.atomic():
+                        numbers += ExpenseSequence.objects.reserve(2034, size % 3 + 1)
+            finally:
+                connection.close()
+        
+        threads = [Thread(target=reserve, args=(numbers,)) for numbers in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        reserved = [number for numbers in results for number in numbers]
+        self.assertEqual(len(reserved), self.THREADS * sum(size % 3 + 1 for size in range(1, self.RESERVATIONS + 1)))
+        self.assertEqual(len(set(reserved)), len(reserved))
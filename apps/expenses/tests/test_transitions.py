@@ -0,0 +1,248 @@
+from datetime import date
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.approvals import rules
+from apps.approvals.models import ApprovalHistory, ApprovalWorkflow
+from apps.companies.models import ApprovalRule, Company, ExpenseCategory
+
+from apps.expenses import transitions
+from apps.expenses.models import EmployeeExpenseCounter, Expense
+
+
+class ExpenseTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(
+            name='Acme', slug='acme', email='acme@example.com', address_line_1='1 Main St',
+            city='City', state_province='State', postal_code='00000', country='US'
+        )
+        cls.category = ExpenseCategory.objects.create(company=cls.company, name='Travel')
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='admin', company=cls.company)
+        cls.manager = User.objects.create(
+            username='manager', email='manager@example.com', role='manager', company=cls.company, manager=cls.admin
+        )
+        cls.employee = User.objects.create(
+            username='employee', email='employee@example.com', role='employee', company=cls.company, manager=cls.manager
+        )
+        cls.colleague = User.objects.create(
+            username='colleague', email='colleague@example.com', role='employee', company=cls.company, manager=cls.manager
+        )
+        # Every expense needs its manager and then an admin
+        ApprovalRule.objects.create(
+            company=cls.company, name='Two steps', rule_type='amount_threshold', requires_admin_approval=True
+        )
+    
+    def setUp(self):
+        # Compiled rules are cached on company ID and rules version, which
+        # repeat between test cases
+        rules._compiled.clear()
+    
+    def create_expense(self, employee=None, amount=10):
+        return Expense.objects.create(
+            employee=employee or self.employee, company=self.company, category=self.category, amount=amount,
+            description='Taxi', expense_date=date.today()
+        )
+    
+    def assertCounts(self, employee, approved_amount=0, **counts):
+        counter = EmployeeExpenseCounter.objects.get(employee=employee)
+        for status in ('draft', 'submitted', 'pending', 'approved', 'rejected', 'cancelled'):
+            self.assertEqual(getattr(counter, f'{status}_count'), counts.get(status, 0), status)
+        self.assertEqual(counter.approved_amount, approved_amount)
+    
+    def steps(self, expense):
+        return list(
+            ApprovalWorkflow.objects.filter(expense=expense).order_by('step_order').values_list('approver_id', 'status')
+        )
+    
+    def test_owner_actions_follow_the_state_machine(self):
+        expense = self.create_expense()
+        self.assertCounts(self.employee, draft=1)
+        
+        transitions.transition(expense, 'submit', self.employee)
+        self.assertEqual(expense.status, 'submitted')
+        self.assertEqual(self.steps(expense), [(self.manager.pk, 'pending'), (self.admin.pk, 'pending')])
+        self.assertCounts(self.employee, submitted=1)
+        
+        transitions.transition(expense, 'cancel', self.employee)
+        self.assertEqual(expense.status, 'cancelled')
+        self.assertEqual(self.steps(expense), [(self.manager.pk, 'cancelled'), (self.admin.pk, 'cancelled')])
+        self.assertCounts(self.employee, cancelled=1)
+        
+        transitions.transition(expense, 'reopen', self.employee)
+        self.assertEqual(expense.status, 'draft')
+        self.assertCounts(self.employee, draft=1)
+        
+        transitions.transition(expense, 'submit', self.employee)
+        # The new chain is numbered after the cancelled one
+        self.assertEqual(self.steps(expense)[2:], [(self.manager.pk, 'pending'), (self.admin.pk, 'pending')])
+        self.assertCounts(self.employee, submitted=1)
+        self.assertEqual(
+            list(ApprovalHistory.objects.filter(expense=expense).order_by('id').values_list('action_type', flat=True)),
+            ['submitted', 'cancelled', 'reopened', 'submitted'],
+        )
+    
+    def test_blocked_transitions_change_nothing(self):
+        expense = self.create_expense()
+        for action, message in (
+            ('approve', 'Cannot approve an expense that is draft'),
+            ('reject', 'Cannot reject an expense that is draft'),
+            ('reopen', 'Cannot reopen an expense that is draft'),
+        ):
+            with self.subTest(action=action):
+                with self.assertRaisesMessage(transitions.TransitionError, message):
+                    transitions.transition(expense, action, self.admin)
+        
+        transitions.transition(expense, 'submit', self.employee)
+        with self.assertRaisesMessage(transitions.TransitionError, 'Cannot submit an expense that is submitted'):
+            transitions.transition(expense, 'submit', self.employee)
+        with self.assertRaisesMessage(transitions.TransitionError, 'Unknown action'):
+            transitions.transition(expense, 'archive', self.employee)
+        
+        expense.refresh_from_db()
+        self.assertEqual(expense.status, 'submitted')
+        self.assertCounts(self.employee, submitted=1)
+        self.assertEqual(ApprovalHistory.objects.filter(expense=expense).count(), 1)
+    
+    def test_only_the_owner_or_an_admin_runs_owner_actions(self):
+        expense = self.create_expense()
+        with self.assertRaisesMessage(transitions.TransitionError, 'Only the expense owner can do this'):
+            transitions.transition(expense, 'submit', self.manager)
+        # Other employees cannot see the expense at all
+        with self.assertRaisesMessage(transitions.TransitionError, 'Expense not found'):
+            transitions.transition(expense, 'submit', self.colleague)
+        self.assertCounts(self.employee, draft=1)
+        
+        transitions.transition(expense, 'submit', self.admin)
+        self.assertEqual(expense.status, 'submitted')
+        self.assertCounts(self.employee, submitted=1)
+    
+    def test_only_other_managers_and_admins_approve(self):
+        expense = self.create_expense()
+        transitions.transition(expense, 'submit', self.employee)
+        with self.assertRaisesMessage(transitions.TransitionError, 'Only managers and admins can approve or reject'):
+            transitions.transition(expense, 'approve', self.employee)
+        
+        own = self.create_expense(employee=self.manager)
+        transitions.transition(own, 'submit', self.manager)
+        with self.assertRaisesMessage(transitions.TransitionError, 'You cannot approve or reject your own expense'):
+            transitions.transition(own, 'reject', self.manager)
+        
+        self.assertCounts(self.employee, submitted=1)
+        self.assertCounts(self.manager, submitted=1)
+    
+    def test_multi_step_approval_waits_for_every_step(self):
+        expense = self.create_expense(amount=25)
+        transitions.transition(expense, 'submit', self.employee)
+        
+        result = transitions.bulk_transition([expense.pk], 'approve', self.manager)
+        self.assertEqual((result.succeeded, result.partial, result.failed), ([], [expense.pk], {}))
+        expense.refresh_from_db()
+        self.assertEqual(expense.status, 'pending')
+        self.assertIsNone(expense.approved_by)
+        self.assertEqual(self.steps(expense), [(self.manager.pk, 'approved'), (self.admin.pk, 'pending')])
+        self.assertCounts(self.employee, pending=1)
+        
+        with self.assertRaisesMessage(transitions.TransitionError, 'Waiting on another approver'):
+            transitions.transition(expense, 'approve', self.manager)
+        self.assertCounts(self.employee, pending=1)
+        
+        transitions.transition(expense, 'approve', self.admin)
+        self.assertEqual(expense.status, 'approved')
+        self.assertEqual(expense.approved_by, self.admin)
+        self.assertEqual(self.steps(expense), [(self.manager.pk, 'approved'), (self.admin.pk, 'approved')])
+        self.assertCounts(self.employee, approved=1, approved_amount=25)
+        self.assertEqual(
+            list(ApprovalHistory.objects.filter(expense=expense, action_type='approved').order_by('id').values_list(
+                'new_status', 'metadata'
+            )),
+            [('pending', {'final': False}), ('approved', {'final': True})],
+        )
+    
+    def test_rejection_closes_the_remaining_steps(self):
+        expense = self.create_expense()
+        transitions.transition(expense, 'submit', self.employee)
+        
+        transitions.transition(expense, 'reject', self.manager, reason='No receipt')
+        self.assertEqual(expense.status, 'rejected')
+        self.assertEqual((expense.rejected_by, expense.rejection_reason), (self.manager, 'No receipt'))
+        self.assertEqual(self.steps(expense), [(self.manager.pk, 'rejected'), (self.admin.pk, 'cancelled')])
+        self.assertCounts(self.employee, rejected=1)
+        
+        transitions.transition(expense, 'reopen', self.employee)
+        self.assertEqual((expense.status, expense.rejected_by, expense.rejection_reason), ('draft', None, ''))
+        self.assertCounts(self.employee, draft=1)
+    
+    def test_bulk_transition_reports_failures_per_expense(self):
+        draft = self.create_expense()
+        submitted = self.create_expense()
+        transitions.transition(submitted, 'submit', self.employee)
+        foreign = self.create_expense(employee=self.colleague)
+        
+        result = transitions.bulk_transition([draft.pk, submitted.pk, foreign.pk, draft.pk], 'submit', self.employee)
+        self.assertEqual(result.succeeded, [draft.pk])
+        self.assertEqual(result.failed, {
+            submitted.pk: 'Cannot submit an expense that is submitted',
+            foreign.pk: 'Expense not found',
+        })
+        self.assertCounts(self.employee, submitted=2)
+        self.assertCounts(self.colleague, draft=1)
+
+
+class ExpenseStatusPatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(
+            name='Acme', slug='acme', email='acme@example.com', address_line_1='1 Main St',
+            city='City', state_province='State', postal_code='00000', country='US'
+        )
+        cls.category = ExpenseCategory.objects.create(company=cls.company, name='Travel')
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='admin', company=cls.company)
+        cls.manager = User.objects.create(
+            username='manager', email='manager@example.com', role='manager', company=cls.company, manager=cls.admin
+        )
+        cls.employee = User.objects.create(
+            username='employee', email='employee@example.com', role='employee', company=cls.company, manager=cls.manager
+        )
+        ApprovalRule.objects.create(company=cls.company, name='Managers', rule_type='amount_threshold')
+    
+    def setUp(self):
+        rules._compiled.clear()
+        self.expense = Expense.objects.create(
+            employee=self.employee, company=self.company, category=self.category, amount=10,
+            description='Taxi', expense_date=date.today()
+        )
+    
+    def patch(self, user, data):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.patch(f'/api/expenses/{self.expense.pk}/', data, format='json', HTTP_HOST='localhost')
+    
+    def test_status_patch_runs_the_transition(self):
+        response = self.patch(self.employee, {'status': 'submitted'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'submitted')
+        self.assertTrue(ApprovalWorkflow.objects.filter(expense=self.expense, approver=self.manager).exists())
+        
+        response = self.patch(self.manager, {'status': 'rejected', 'rejection_reason': 'Duplicate'})
+        self.assertEqual(response.status_code, 200)
+        self.expense.refresh_from_db()
+        self.assertEqual((self.expense.status, self.expense.rejected_by), ('rejected', self.manager))
+        self.assertEqual(EmployeeExpenseCounter.objects.get(employee=self.employee).rejected_count, 1)
+    
+    def test_status_patch_rejects_blocked_changes(self):
+        for user, status, message in (
+            (self.employee, 'pending', 'Expenses cannot be moved to pending directly'),
+            (self.employee, 'approved', 'Cannot approve an expense that is draft'),
+            (self.manager, 'submitted', 'Only the expense owner can do this'),
+        ):
+            with self.subTest(status=status):
+                response = self.patch(user, {'status': status, 'description': 'Changed'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, str(response.data['status']))
+        
+        self.expense.refresh_from_db()
+        self.assertEqual((self.expense.status, self.expense.description), ('draft', 'Taxi'))
+        self.assertEqual(EmployeeExpenseCounter.objects.get(employee=self.employee).draft_count, 1)
@@ -0,0 +1,255 @@
+"""
+Expense status transitions.
+
+Every status change goes through `bulk_transition` (or `transition` for a
+single expense), which in one transaction:
+
+- locks the expenses and checks each one may make the transition
+- updates them with one UPDATE per outcome
+- resolves the actor's approval workflow steps, or on submit builds the
+  approval chain from the company's approval rules
+- records ApprovalHistory rows and notifications with bulk_create
+- adjusts the employee expense counters and summary cache versions, and
+  clears the cached inbox counts of the approvers involved
+
+so approving 500 expenses costs a fixed number of queries.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.approvals import inbox, rules
+from apps.approvals.models import ApprovalHistory, ApprovalWorkflow
+from apps.notifications.models import Notification
+
+from . import summary
+from .models import Expense, EmployeeExpenseCounter
+
+
+class TransitionError(Exception):
+    pass
+
+
+# action: (allowed current statuses, new status, ApprovalHistory action)
+TRANSITIONS = {
+    'submit': ({'draft'}, 'submitted', 'submitted'),
+    'approve': ({'submitted', 'pending'}, 'approved', 'approved'),
+    'reject': ({'submitted', 'pending'}, 'rejected', 'rejected'),
+    'cancel': ({'draft', 'submitted', 'pending'}, 'cancelled', 'cancelled'),
+    'reopen': ({'rejected', 'cancelled'}, 'draft', 'reopened'),
+}
+
+# Target status -> action, for clients that PATCH `status`
+STATUS_ACTIONS = {new_status: action for action, (_, new_status, _) in TRANSITIONS.items()}
+
+OWNER_ACTIONS = {'submit', 'cancel', 'reopen'}
+APPROVER_ACTIONS = {'approve', 'reject'}
+
+NOTIFICATIONS = {
+    'approve': ('expense_approved', 'Expense approved', 'Your expense {id} of {amount} {currency} was approved.'),
+    'reject': ('expense_rejected', 'Expense rejected', 'Your expense {id} of {amount} {currency} was rejected.'),
+    'submit': ('expense_submitted', 'Expense submitted', '{employee} submitted expense {id} of {amount} {currency}.'),
+}
+
+
+@dataclass
+class TransitionResult:
+    action: str
+    succeeded: list = field(default_factory=list)
+    # Expenses approved by the actor but still waiting on other approvers
+    partial: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+    
+    def as_dict(self):
+        return {
+            'action': self.action,
+            'succeeded': self.succeeded,
+            'partial': self.partial,
+            'failed': self.failed,
+        }
+
+
+def check_actor(action, actor, expense):
+    if actor.role == 'admin':
+        return None
+    if action in OWNER_ACTIONS and expense['employee_id'] != actor.pk:
+        return 'Only the expense owner can do this'
+    if action in APPROVER_ACTIONS:
+        if actor.role != 'manager':
+            return 'Only managers and admins can approve or reject expenses'
+        if expense['employee_id'] == actor.pk:
+            return 'You cannot approve or reject your own expense'
+    return None
+
+
+def bulk_transition(expense_ids, action, actor, comments='', reason='', queryset=None):
+    """
+    Apply `action` to every expense in `expense_ids` that `queryset` (default:
+    the expenses `actor` can see) contains and that allows it. Failures are
+    reported per expense and do not stop the others.
+    """
+    if action not in TRANSITIONS:
+        raise TransitionError(f'Unknown action {action}')
+    allowed, new_status, history_action = TRANSITIONS[action]
+    if queryset is None:
+        queryset = Expense.objects.visible_to(actor)
+    expense_ids = list(dict.fromkeys(expense_ids))
+    result = TransitionResult(action)
+    now = timezone.now()
+    
+    with transaction.atomic():
+        rows = {
+            row['id']: row
+            for row in queryset.select_for_update(of=('self',)).filter(id__in=expense_ids).values(
+                'id', 'employee_id', 'employee__manager_id', 'employee__first_name',
+                'employee__last_name', 'employee__profile__department', 'company_id',
+                'company__approval_rules_version', 'category_id', 'status', 'amount', 'currency'
+            )
+        }
+        candidates = []
+        for expense_id in expense_ids:
+            row = rows.get(expense_id)
+            if row is None:
+                result.failed[expense_id] = 'Expense not found'
+            elif row['status'] not in allowed:
+                result.failed[expense_id] = f"Cannot {action} an expense that is {row['status']}"
+            else:
+                error = check_actor(action, actor, row)
+                if error:
+                    result.failed[expense_id] = error
+                else:
+                    candidates.append(expense_id)
+        
+        # Approvers whose inbox changes: those of the open steps before and,
+        # for submissions, after the transition
+        approver_ids = set(
+            ApprovalWorkflow.objects.filter(expense_id__in=candidates, status='pending')
+            .values_list('approver_id', flat=True)
+        ) if candidates else set()
+        
+        final, partial = candidates, []
+        if action in APPROVER_ACTIONS and candidates:
+            final, partial = resolve_steps(action, actor, candidates, result, comments, reason, now)
+        
+        values = {'status': new_status, 'updated_at': now}
+        if action == 'approve':
+            values.update(approved_by=actor, approved_at=now)
+        elif action == 'reject':
+            values.update(rejected_by=actor, rejected_at=now, rejection_reason=reason)
+        elif action == 'reopen':
+            values.update(
+                approved_by=None, approved_at=None, rejected_by=None, rejected_at=None, rejection_reason=''
+            )
+        Expense.objects.filter(id__in=final).update(**values)
+        Expense.objects.filter(id__in=partial).exclude(status='pending').update(status='pending', updated_at=now)
+        if action in ('cancel', 'submit') and final:
+            # A cancelled expense needs no more approvals, and a resubmission
+            # starts a new chain that the old steps must not block
+            ApprovalWorkflow.objects.filter(expense_id__in=final, status='pending').update(
+                status='cancelled', updated_at=now
+            )
+        if action == 'submit':
+            chained = rules.build_chains([rows[expense_id] for expense_id in final], now)
+            approver_ids.update(
+                ApprovalWorkflow.objects.filter(expense_id__in=chained, status='pending')
+                .values_list('approver_id', flat=True)
+            )
+        
+        changed = [(rows[expense_id], new_status) for expense_id in final]
+        changed += [(rows[expense_id], 'pending') for expense_id in partial if rows[expense_id]['status'] != 'pending']
+        EmployeeExpenseCounter.objects.apply(
+            [(row['employee_id'], row['status'], row['amount'], -1) for row, _ in changed] +
+            [(row['employee_id'], status, row['amount'], 1) for row, status in changed]
+        )
+        
+        ApprovalHistory.objects.bulk_create([
+            ApprovalHistory(
+                expense_id=expense_id,
+                action_type=history_action,
+                performed_by=actor,
+                comments=comments or reason,
+                old_status=rows[expense_id]['status'],
+                new_status=new_status if expense_id in final else 'pending',
+                metadata={'final': expense_id in final} if action == 'approve' else {},
+            )
+            for expense_id in final + partial
+        ])
+        Notification.objects.bulk_create(build_notifications(action, [rows[expense_id] for expense_id in final]))
+        
+        for company_id in {row['company_id'] for row, _ in changed}:
+            summary.bump_version(company_id)
+        if approver_ids:
+            transaction.on_commit(lambda: inbox.invalidate_counts(approver_ids))
+    
+    result.succeeded = final
+    result.partial = partial
+    return result
+
+
+def resolve_steps(action, actor, expense_ids, result, comments, reason, now):
+    """
+    Resolve the approval workflow steps for an approve or reject. Returns the
+    expenses whose status changes and, for approvals, those that still wait
+    on other approvers.
+    """
+    pending = ApprovalWorkflow.objects.filter(expense_id__in=expense_ids, status='pending')
+    own = set(pending.filter(approver=actor).values_list('expense_id', flat=True))
+    others = set(pending.exclude(approver=actor).values_list('expense_id', flat=True))
+    
+    final, partial = [], []
+    for expense_id in expense_ids:
+        if actor.role == 'admin' or expense_id not in others:
+            final.append(expense_id)
+        elif expense_id in own:
+            # Rejections are final; approvals wait for the remaining steps
+            (partial if action == 'approve' else final).append(expense_id)
+        else:
+            result.failed[expense_id] = 'Waiting on another approver'
+    
+    step_values = {'updated_at': now}
+    if action == 'approve':
+        step_values.update(status='approved', approved_at=now, comments=comments)
+    else:
+        step_values.update(status='rejected', rejected_at=now, comments=comments, rejection_reason=reason)
+    pending.filter(approver=actor, expense_id__in=final + partial).update(**step_values)
+    # A decision on the expense as a whole closes the remaining steps
+    pending.filter(expense_id__in=final).exclude(approver=actor).update(status='cancelled', updated_at=now)
+    return final, partial
+
+
+def build_notifications(action, rows):
+    if action not in NOTIFICATIONS:
+        return []
+    notification_type, title, message = NOTIFICATIONS[action]
+    notifications = []
+    for row in rows:
+        recipient_id = row['employee__manager_id'] if action == 'submit' else row['employee_id']
+        if recipient_id is None:
+            continue
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            notification_type=notification_type,
+            title=title,
+            message=message.format(
+                id=row['id'],
+                amount=row['amount'],
+                currency=row['currency'],
+                employee=f"{row['employee__first_name']} {row['employee__last_name']}",
+            ),
+            expense_id=row['id'],
+        ))
+    return notifications
+
+
+def transition(expense, action, actor, comments='', reason='', queryset=None):
+    """
+    Apply `action` to one expense and return it reloaded; raises
+    TransitionError if it is not allowed
+    """
+    result = bulk_transition([expense.pk], action, actor, comments, reason, queryset)
+    if result.failed:
+        raise TransitionError(result.failed[expense.pk])
+    expense.refresh_from_db()
+    expense._counted_state = expense.counter_state()
+    return expense
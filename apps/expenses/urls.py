@@ -4,12 +4,23 @@ from . import views
 urlpatterns = [
     # Expense endpoints will be added here
     path('', views.ExpenseListView.as_view(), name='expense-list'),
-    path('<str:pk>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
     path('submit/', views.ExpenseSubmitView.as_view(), name='expense-submit'),
+    path('import/', views.ExpenseImportView.as_view(), name='expense-import'),
+    path('export/', views.ExpenseExportView.as_view(), name='expense-export'),
+    path('summary/', views.ExpenseSummaryView.as_view(), name='expense-summary'),
+    path('transition/', views.ExpenseBulkTransitionView.as_view(), name='expense-bulk-transition'),
     path('templates/', views.ExpenseTemplateListView.as_view(), name='expense-template-list'),
     path('templates/<int:pk>/', views.ExpenseTemplateDetailView.as_view(), name='expense-template-detail'),
     path('tags/', views.ExpenseTagListView.as_view(), name='expense-tag-list'),
     path('tags/<int:pk>/', views.ExpenseTagDetailView.as_view(), name='expense-tag-detail'),
+    # Static routes above must come before the catch-all expense ID route
+    path('<str:pk>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
+    path('<str:pk>/transition/', views.ExpenseTransitionView.as_view(), name='expense-transition'),
+    path('<str:pk>/duplicates/', views.ExpenseDuplicatesView.as_view(), name='expense-duplicates'),
     path('<str:expense_id>/comments/', views.ExpenseCommentListView.as_view(), name='expense-comment-list'),
     path('<str:expense_id>/receipts/', views.ExpenseReceiptListView.as_view(), name='expense-receipt-list'),
+    path('<str:expense_id>/receipts/<int:pk>/ocr/', views.ReceiptOCRStatusView.as_view(), name='receipt-ocr-status'),
+    path('<str:expense_id>/receipts/<int:pk>/<str:variant>/', views.ReceiptDerivativeView.as_view(), name='receipt-derivative'),
+    path('<str:expense_id>/receipts/uploads/', views.ReceiptUploadCreateView.as_view(), name='receipt-upload-create'),
+    path('<str:expense_id>/receipts/uploads/<uuid:pk>/', views.ReceiptUploadDetailView.as_view(), name='receipt-upload-detail'),
 ]
@@ -1,105 +1,545 @@
-from rest_framework import generics, filters
+import itertools
+
+from rest_framework import generics, filters, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
-from .models import Expense
-from .serializers import ExpenseSerializer
+from django.db.models import Prefetch, Q
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.accounts.models import User, UserHierarchy
+from apps.approvals.models import ApprovalWorkflow
+from apps.core.conditional import ConditionalGetMixin
+from .models import ArchivedExpense, Expense, ExpenseComment, ExpenseReceipt, ExpenseTag, ExpenseTemplate, ReceiptUpload
+from . import duplicates, exporters, receipts, summary, transitions
+from .filters import ExpenseSearchFilter, ExpenseTagFilter
+from .importers import ExpenseImporter
+from .pagination import ExpenseCursorPagination, ExpenseCommentCursorPagination
+from .serializers import (
+    ExpenseSerializer, ExpenseListSerializer, ExpenseReceiptSerializer, ReceiptUploadSerializer,
+    ReceiptOCRStatusSerializer, ExpenseTagSerializer, ExpenseTemplateSerializer, ExpenseCommentSerializer,
+    ExpenseTransitionSerializer, ExpenseBulkTransitionSerializer, ArchivedExpenseSerializer
+)
+
+
+class ExpenseCreateMixin:
+    """
+    Create an expense; the response lists likely duplicates under
+    `possible_duplicates`
+    """
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['possible_duplicates'] = duplicates.find_duplicates(self.expense)
+        return response
+    
+    def perform_create(self, serializer):
+        # New expenses start as drafts (ExpenseSerializer allows no other
+        # status but submitted); submitted ones go through the submit
+        # transition so their approval chain is built
+        submit = serializer.validated_data.get('status') == 'submitted'
+        serializer.validated_data['status'] = 'draft'
+        with transaction.atomic():
+            self.expense = serializer.save()
+            if submit:
+                try:
+                    transitions.transition(
+                        self.expense, 'submit', self.request.user,
+                        queryset=Expense.objects.filter(pk=self.expense.pk),
+                    )
+                except transitions.TransitionError as e:
+                    raise ValidationError({'status': str(e)})
 
 
-class ExpenseListView(generics.ListCreateAPIView):
+class ExpenseListView(ExpenseCreateMixin, generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = ExpenseCursorPagination
+    filter_backends = [DjangoFilterBackend, ExpenseTagFilter, filters.OrderingFilter, ExpenseSearchFilter]
     filterset_fields = ['status', 'category', 'employee', 'expense_date']
-    search_fields = ['description', 'merchant', 'id']
     ordering_fields = ['expense_date', 'submission_date', 'amount']
     ordering = ['-submission_date']
     
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return ExpenseListSerializer
+        return ExpenseSerializer
+    
     def get_queryset(self):
-        user = self.request.user
+        # Employees see their own expenses, managers their whole reporting
+        # line and admins everything in their company
+        queryset = Expense.objects.visible_to(self.request.user)
         
-        # Base queryset filtered by company
-        queryset = Expense.objects.filter(company=user.company)
-        
-        # Role-based filtering
-        if user.role == 'employee':
-            # Employees can only see their own expenses
-            queryset = queryset.filter(employee=user)
-        elif user.role == 'manager':
-            # Managers can see expenses from their subordinates and their own
-            subordinate_ids = user.subordinates.values_list('id', flat=True)
-            queryset = queryset.filter(
-                models.Q(employee=user) | 
-                models.Q(employee_id__in=subordinate_ids)
+        if self.request.method == 'GET':
+            # Resolve every name the list serializer shows in a fixed number
+            # of queries regardless of page size
+            queryset = queryset.select_related(
+                'employee', 'category', 'approved_by', 'rejected_by'
+            ).prefetch_related(
+                # Steps cancelled by a resubmission or cancel belong to a
+                # superseded chain and are not current approvers
+                Prefetch(
+                    'approval_workflow',
+                    queryset=ApprovalWorkflow.objects.select_related('approver')
+                    .exclude(status='cancelled')
+                    .order_by('expense_id', 'step_order'),
+                )
             )
-        # Admins can see all expenses in their company (already filtered by company)
         
         return queryset
 
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    serializer_class = ExpenseSerializer
-    permission_classes = [IsAuthenticated]
+class ExpenseExportView(ExpenseListView):
+    """
+    Stream the filtered expense list as CSV or XLSX.
+
+    Accepts the same filters, search and ordering as ExpenseListView and
+    applies the same role scoping. Choose the format with `?file_format=`;
+    `?include_archived=true` appends matching archived expenses. CSV streams
+    as rows are read; an XLSX download only starts once the whole workbook
+    has been built.
+    """
+    http_method_names = ['get', 'head', 'options']
     
-    def get_queryset(self):
-        user = self.request.user
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in ('csv', 'xlsx'):
+            return Response({'error': 'file_format must be csv or xlsx'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Base queryset filtered by company
-        queryset = Expense.objects.filter(company=user.company)
+        rows = exporters.iter_rows(self.filter_queryset(self.get_queryset()))
+        if request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes'):
+            if any(param in request.query_params for param in ('search', 'tags', 'tags_any', 'tags_not')):
+                return Response(
+                    {'error': 'include_archived cannot be combined with search or tag filters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            archived = ArchivedExpense.objects.visible_to(request.user)
+            archived = DjangoFilterBackend().filter_queryset(request, archived, self)
+            rows = itertools.chain(rows, exporters.iter_archived_rows(archived))
+        file_name = f"expenses-{timezone.now():%Y%m%d-%H%M%S}.{file_format}"
         
-        # Role-based filtering
-        if user.role == 'employee':
-            # Employees can only see their own expenses
-            queryset = queryset.filter(employee=user)
-        elif user.role == 'manager':
-            # Managers can see expenses from their subordinates and their own
-            subordinate_ids = user.subordinates.values_list('id', flat=True)
-            queryset = queryset.filter(
-                models.Q(employee=user) | 
-                models.Q(employee_id__in=subordinate_ids)
+        if file_format == 'xlsx':
+            return FileResponse(
+                exporters.write_xlsx(rows),
+                as_attachment=True,
+                filename=file_name,
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             )
-        # Admins can see all expenses in their company (already filtered by company)
         
-        return queryset
+        response = StreamingHttpResponse(exporters.iter_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        return response
 
 
-class ExpenseSubmitView(generics.CreateAPIView):
-    queryset = Expense.objects.all()
+class ExpenseSummaryView(ExpenseListView):
+    """
+    Counts and amount totals of the expenses the list endpoint would return
+    (same scoping and filters), grouped by status, category and month
+    """
+    http_method_names = ['get', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, ExpenseTagFilter, ExpenseSearchFilter]
+    
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(Expense.objects.visible_to(request.user))
+        return Response(summary.cached_summary(request.user, request.META.get('QUERY_STRING', ''), queryset))
+
+
+class ExpenseDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return Expense.objects.visible_to(self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Closed expenses may have moved to the archive; they are read-only
+            archived = get_object_or_404(ArchivedExpense.objects.visible_to(request.user), pk=kwargs['pk'])
+            return Response(ArchivedExpenseSerializer(archived).data)
+    
+    def perform_update(self, serializer):
+        # Status changes and their side effects go through the transition service
+        new_status = serializer.validated_data.pop('status', None)
+        expense = serializer.instance
+        with transaction.atomic():
+            if new_status is not None and new_status != expense.status:
+                action = transitions.STATUS_ACTIONS.get(new_status)
+                if action is None:
+                    raise ValidationError({'status': f'Expenses cannot be moved to {new_status} directly'})
+                try:
+                    transitions.transition(
+                        expense, action, self.request.user,
+                        reason=serializer.validated_data.get('rejection_reason', ''),
+                        queryset=self.get_queryset(),
+                    )
+                except transitions.TransitionError as e:
+                    raise ValidationError({'status': str(e)})
+            serializer.save()
 
 
-class ExpenseTemplateListView(generics.ListCreateAPIView):
-    queryset = Expense.objects.all()
-    serializer_class = ExpenseSerializer
+class ExpenseTransitionView(APIView):
+    """
+    Apply a status transition (submit, approve, reject, cancel, reopen) to one
+    expense, with approval history and notifications
+    """
     permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk):
+        expense = get_object_or_404(Expense.objects.visible_to(request.user), pk=pk)
+        serializer = ExpenseTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            transitions.transition(expense, data['action'], request.user, data['comments'], data['reason'])
+        except transitions.TransitionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ExpenseSerializer(expense).data)
 
 
-class ExpenseTemplateDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseBulkTransitionView(APIView):
+    """
+    Apply one status transition to many expenses at once. Expenses that
+    cannot make the transition are listed under `failed` with the reason.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = ExpenseBulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = transitions.bulk_transition(
+            data['expense_ids'], data['action'], request.user, data['comments'], data['reason']
+        )
+        return Response(result.as_dict())
+
+
+class ExpenseSubmitView(ExpenseCreateMixin, generics.CreateAPIView):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
 
 
+class ExpenseDuplicatesView(APIView):
+    """
+    Likely duplicates of an expense, including receipt image matches found
+    since it was submitted
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        expense = get_object_or_404(Expense.objects.visible_to(request.user), pk=pk)
+        return Response({'id': expense.id, 'possible_duplicates': duplicates.find_duplicates(expense)})
+
+
+class ExpenseImportView(APIView):
+    """
+    Bulk import expenses from an uploaded CSV or XLSX file
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        user = request.user
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        if not user.company:
+            return Response({'error': 'User does not belong to a company'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Employees may only import their own expenses, managers those of
+        # their reporting line
+        employees = None
+        if user.role == 'manager':
+            employees = User.objects.filter(
+                id__in=UserHierarchy.objects.filter(ancestor=user).values('descendant_id')
+            )
+        importer = ExpenseImporter(user.company, user, own_only=user.role == 'employee', employees=employees)
+        try:
+            result = importer.run(upload, upload.name)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+
+class ExpenseTemplateMixin:
+    """
+    Company templates; employees only see the ones they created or that
+    recur for them
+    """
+    serializer_class = ExpenseTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        templates = ExpenseTemplate.objects.filter(company=user.company).select_related('category')
+        if user.role == 'employee':
+            templates = templates.filter(Q(created_by=user) | Q(employee=user))
+        return templates
+
+
+class ExpenseTemplateListView(ExpenseTemplateMixin, generics.ListCreateAPIView):
+    def perform_create(self, serializer):
+        user = self.request.user
+        # Employees can only set up recurring expenses for themselves
+        employee = user if user.role == 'employee' else serializer.validated_data.get('employee')
+        serializer.save(company=user.company, created_by=user, employee=employee)
+
+
+class ExpenseTemplateDetailView(ConditionalGetMixin, ExpenseTemplateMixin, generics.RetrieveUpdateDestroyAPIView):
+    # The payload includes the category name
+    last_modified_fields = ('updated_at', 'category__updated_at')
+    
+    def perform_update(self, serializer):
+        user = self.request.user
+        if user.role == 'employee':
+            serializer.save(employee=user)
+        else:
+            serializer.save()
+
+
 class ExpenseTagListView(generics.ListCreateAPIView):
-    queryset = Expense.objects.all()
-    serializer_class = ExpenseSerializer
+    serializer_class = ExpenseTagSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = None
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['name']
+    
+    def get_queryset(self):
+        return ExpenseTag.objects.filter(company=self.request.user.company)
+    
+    def create(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can manage tags'}, status=status.HTTP_403_FORBIDDEN)
+        return super().create(request, *args, **kwargs)
+    
+    def perform_create(self, serializer):
+        serializer.save(company=self.request.user.company)
 
 
 class ExpenseTagDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Expense.objects.all()
-    serializer_class = ExpenseSerializer
+    serializer_class = ExpenseTagSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ExpenseTag.objects.filter(company=self.request.user.company)
+    
+    def update(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can manage tags'}, status=status.HTTP_403_FORBIDDEN)
+        return super().update(request, *args, **kwargs)
+    
+    def destroy(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admins can manage tags'}, status=status.HTTP_403_FORBIDDEN)
+        return super().destroy(request, *args, **kwargs)
 
 
 class ExpenseCommentListView(generics.ListCreateAPIView):
-    queryset = Expense.objects.all()
-    serializer_class = ExpenseSerializer
+    """
+    An expense's comment thread, oldest first and cursor paginated.
+
+    `?since=<ISO timestamp>` returns only comments created after that time,
+    together with the `since` and `since_id` of the last one returned to
+    poll with next; comments sharing that timestamp with a higher ID are
+    still delivered. Internal comments are never returned to employees.
+    """
+    serializer_class = ExpenseCommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCommentCursorPagination
+    
+    def get_expense(self):
+        if not hasattr(self, '_expense'):
+            self._expense = get_object_or_404(
+                Expense.objects.visible_to(self.request.user).only('id'), pk=self.kwargs['expense_id']
+            )
+        return self._expense
+    
+    def get_queryset(self):
+        comments = ExpenseComment.objects.filter(expense=self.get_expense()).select_related('author')
+        if self.request.user.role == 'employee':
+            comments = comments.filter(is_internal=False)
+        return comments
+    
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        
+        since = parse_datetime(request.query_params['since'])
+        if since is None:
+            return Response({'error': 'Invalid since timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        newer = Q(created_at__gt=since)
+        since_id = request.query_params.get('since_id')
+        if since_id is not None:
+            try:
+                since_id = int(since_id)
+            except ValueError:
+                return Response({'error': 'Invalid since_id'}, status=status.HTTP_400_BAD_REQUEST)
+            newer |= Q(created_at=since, id__gt=since_id)
+        
+        limit = self.pagination_class.max_page_size
+        comments = list(self.get_queryset().filter(newer).order_by('created_at', 'id')[:limit + 1])
+        has_more = len(comments) > limit
+        comments = comments[:limit]
+        return Response({
+            'since': comments[-1].created_at if comments else since,
+            'since_id': comments[-1].pk if comments else since_id,
+            'has_more': has_more,
+            'results': self.get_serializer(comments, many=True).data,
+        })
+    
+    def perform_create(self, serializer):
+        is_internal = serializer.validated_data.get('is_internal', False)
+        if self.request.user.role == 'employee':
+            is_internal = False
+        serializer.save(expense=self.get_expense(), author=self.request.user, is_internal=is_internal)
 
 
 class ExpenseReceiptListView(generics.ListCreateAPIView):
-    queryset = Expense.objects.all()
-    serializer_class = ExpenseSerializer
+    """
+    List an expense's receipts or attach one with a single multipart upload
+    """
+    serializer_class = ExpenseReceiptSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    pagination_class = None
+    
+    def get_queryset(self):
+        expenses = Expense.objects.visible_to(self.request.user).filter(pk=self.kwargs['expense_id'])
+        return ExpenseReceipt.objects.filter(expense__in=expenses).order_by('uploaded_at')
+    
+    def create(self, request, *args, **kwargs):
+        expense = get_object_or_404(Expense.objects.visible_to(request.user), pk=self.kwargs['expense_id'])
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        receipt = receipts.store_receipt(
+            expense, upload, upload.name, upload.content_type or 'application/octet-stream', upload.size
+        )
+        return Response(self.get_serializer(receipt).data, status=status.HTTP_201_CREATED)
+
+
+class ReceiptOCRStatusView(generics.RetrieveAPIView):
+    """
+    OCR progress and extracted fields for one receipt
+    """
+    serializer_class = ReceiptOCRStatusSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        expenses = Expense.objects.visible_to(self.request.user).filter(pk=self.kwargs['expense_id'])
+        return ExpenseReceipt.objects.filter(expense__in=expenses)
+
+
+class ReceiptDerivativeView(generics.GenericAPIView):
+    """
+    Serve a receipt's thumbnail or preview image.
+
+    Derivative files are named after the content-addressed original, so a
+    given URL never changes content while the receipt exists and is cached
+    by the client for a year.
+    """
+    permission_classes = [IsAuthenticated]
+    variants = ('thumbnail', 'preview')
+    cache_max_age = 365 * 24 * 60 * 60
+    
+    def get_queryset(self):
+        expenses = Expense.objects.visible_to(self.request.user).filter(pk=self.kwargs['expense_id'])
+        return ExpenseReceipt.objects.filter(expense__in=expenses)
+    
+    def get(self, request, *args, **kwargs):
+        if self.kwargs['variant'] not in self.variants:
+            raise Http404
+        receipt = self.get_object()
+        field_file = getattr(receipt, f"{self.kwargs['variant']}_file")
+        if not field_file:
+            return Response({'error': f'No {self.kwargs["variant"]} available', 'preview_status': receipt.preview_status},
+                            status=status.HTTP_404_NOT_FOUND)
+        
+        etag = f'"{receipt.content_hash or receipt.pk}-{self.kwargs["variant"]}"'
+        headers = {'ETag': etag, 'Cache-Control': f'private, max-age={self.cache_max_age}, immutable'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=headers)
+        return FileResponse(field_file.open('rb'), content_type='image/jpeg', headers=headers)
+
+
+class ReceiptUploadCreateView(generics.CreateAPIView):
+    """
+    Start a resumable chunked receipt upload
+    """
+    serializer_class = ReceiptUploadSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        expense = get_object_or_404(Expense.objects.visible_to(self.request.user), pk=self.kwargs['expense_id'])
+        serializer.save(expense=expense, uploaded_by=self.request.user)
+
+
+class ReceiptUploadDetailView(generics.RetrieveDestroyAPIView):
+    """
+    Check progress (GET), send the next chunk (PUT) or abort (DELETE).
+
+    Chunks are sent as the raw request body with an `Upload-Offset` header
+    equal to the number of bytes already received, and optionally an
+    `Upload-Checksum` header holding the chunk's SHA-256. A mismatched
+    offset gets 409 with the offset to resume from.
+    """
+    serializer_class = ReceiptUploadSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ReceiptUpload.objects.filter(
+            expense_id=self.kwargs['expense_id'], uploaded_by=self.request.user
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['Upload-Offset'] = response.data['received_size']
+        return response
+    
+    def put(self, request, *args, **kwargs):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=kwargs['pk'])
+            if upload.status != 'uploading':
+                return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+            if offset != upload.received_size:
+                return Response(
+                    {'error': 'Offset mismatch', 'received_size': upload.received_size},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Upload-Offset': upload.received_size},
+                )
+            try:
+                receipts.append_chunk(upload, request.stream, request.headers.get('Upload-Checksum'))
+            except receipts.ChunkError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Finalize under the same lock so a retried final chunk cannot
+            # store the receipt twice
+            response_status = status.HTTP_200_OK
+            if upload.is_complete:
+                receipts.finalize_upload(upload)
+                response_status = status.HTTP_201_CREATED
+        
+        return Response(
+            self.get_serializer(upload).data,
+            status=response_status,
+            headers={'Upload-Offset': upload.received_size},
+        )
+    
+    def perform_destroy(self, instance):
+        receipts.abort_upload(instance)
@@ -0,0 +1,178 @@
+"""
+Process-pool batch loop shared by the receipt background jobs.
+
+A ReceiptBatchJob claims a batch of receipts by a status field, reads each
+distinct file once, runs its work function over the files in a process pool
+and writes the results back with one bulk update. Work functions run in
+child processes and must not touch the database: the parent hands them
+plain values and persists what they return. A batch that fails is released
+back to `pending`, and rows left `processing` by a worker that died are
+reclaimed once their claim is older than `CLAIM_TIMEOUT`.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExpenseReceipt
+
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+def map_in_pool(func, items, workers=None):
+    """
+    Apply `func` to every item, in a process pool unless `workers` is 1
+    """
+    items = list(items)
+    if not items:
+        return []
+    if workers == 1 or len(items) == 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def local_path_or_bytes(field_file):
+    """
+    A FieldFile as something a child process can open: a filesystem path for
+    local storage, otherwise the file's bytes
+    """
+    try:
+        return field_file.path
+    except NotImplementedError:
+        with field_file.open('rb') as file:
+            return file.read()
+
+
+def claim_receipts(status_field, batch_size, claimed_field=None):
+    """
+    Move up to `batch_size` receipts whose `status_field` is `pending` to
+    `processing` and return them, skipping rows another worker has locked.
+    With `claimed_field`, the claim time is recorded there and stale claims
+    are returned to `pending` first.
+    """
+    now = timezone.now()
+    values = {status_field: 'processing'}
+    if claimed_field:
+        values[claimed_field] = now
+        ExpenseReceipt.objects.filter(
+            **{status_field: 'processing', f'{claimed_field}__lt': now - CLAIM_TIMEOUT}
+        ).update(**{status_field: 'pending'})
+    with transaction.atomic():
+        ids = list(
+            ExpenseReceipt.objects.filter(**{status_field: 'pending'})
+            .order_by('uploaded_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        ExpenseReceipt.objects.filter(id__in=ids).update(**values)
+    return list(ExpenseReceipt.objects.filter(id__in=ids))
+
+
+def release_receipts(status_field, receipts):
+    """
+    Return a claimed batch that could not be finished to `pending`
+    """
+    ExpenseReceipt.objects.filter(
+        id__in=[receipt.pk for receipt in receipts], **{status_field: 'processing'}
+    ).update(**{status_field: 'pending'})
+
+
+class ReceiptBatchJob:
+    """
+    One receipt background job; subclasses fill in the per-file work
+    """
+    status_field = None
+    claimed_field = None
+    # Fields written back by `apply`
+    update_fields = []
+    
+    def group_key(self, receipt):
+        """Receipts with the same key share one job"""
+        return receipt.content_hash or f'receipt-{receipt.pk}'
+    
+    def build_job(self, receipt):
+        """The picklable input of `run` for `receipt`'s file"""
+        raise NotImplementedError
+    
+    @staticmethod
+    def run(job):
+        """Pool entry point; a module-level function in subclasses"""
+        raise NotImplementedError
+    
+    def failure(self, error):
+        """The outcome of a file that could not be read"""
+        raise NotImplementedError
+    
+    def apply(self, group, outcome):
+        """Copy a job's outcome onto the receipts that share it"""
+        raise NotImplementedError
+    
+    def saved(self, receipts):
+        """Called in the transaction that stored the results"""
+    
+    def process(self, batch_size, workers=None):
+        """
+        Process one batch of pending receipts; returns the number processed
+        """
+        receipts = claim_receipts(self.status_field, batch_size, self.claimed_field)
+        if not receipts:
+            return 0
+        
+        try:
+            groups = {}
+            for receipt in receipts:
+                groups.setdefault(self.group_key(receipt), []).append(receipt)
+            
+            jobs = []
+            outcomes = {}
+            for key, group in groups.items():
+                try:
+                    jobs.append((key, self.build_job(group[0])))
+                except (OSError, ValueError) as e:
+                    outcomes[key] = self.failure(f'{e.__class__.__name__}: {e}')
+            
+            results = map_in_pool(self.run, [job for _, job in jobs], workers=workers)
+            outcomes.update(zip([key for key, _ in jobs], results))
+            for key, group in groups.items():
+                self.apply(group, outcomes[key])
+            
+            with transaction.atomic():
+                ExpenseReceipt.objects.bulk_update(receipts, self.update_fields)
+                self.saved(receipts)
+        except BaseException:
+            # Failed or interrupted batches go back to the queue
+            release_receipts(self.status_field, receipts)
+            raise
+        return len(receipts)
+
+
+class ReceiptBatchCommand(BaseCommand):
+    """
+    Management command that runs a module's `process_pending` until the
+    queue is empty, or forever with --loop
+    """
+    module = None
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.module.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Pool size (default: CPU count)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new receipts')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when idle')
+    
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = self.module.process_pending(options['batch_size'], workers=options['workers'])
+            total += processed
+            if processed:
+                self.stdout.write(f'Processed {processed} receipts')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} receipts in total'))
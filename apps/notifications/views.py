@@ -1,5 +1,6 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from apps.core.conditional import ConditionalGetMixin
 from .models import Notification, NotificationTemplate, NotificationPreference, NotificationDigest
 from .serializers import NotificationSerializer, NotificationTemplateSerializer, NotificationPreferenceSerializer, NotificationDigestSerializer
 
@@ -34,7 +35,7 @@ class NotificationTemplateListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class NotificationTemplateDetailView(generics.RetrieveUpdateDestroyAPIView):
+class NotificationTemplateDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = NotificationTemplate.objects.all()
     serializer_class = NotificationTemplateSerializer
     permission_classes = [IsAuthenticated]
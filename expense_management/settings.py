@@ -198,6 +198,45 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache shared by every web and worker process (Redis URL); without one each
+# process gets its own local-memory cache and cross-request caching is off
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+# Receipt uploads
+RECEIPT_MAX_FILE_SIZE = config('RECEIPT_MAX_FILE_SIZE', default=25 * 1024 * 1024, cast=int)
+RECEIPT_UPLOAD_MAX_CHUNK_SIZE = config('RECEIPT_UPLOAD_MAX_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+# Unfinished chunked uploads are deleted after this many hours without a chunk
+RECEIPT_UPLOAD_EXPIRY_HOURS = config('RECEIPT_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Receipt OCR engine (dotted path to an apps.expenses.ocr.BaseOCREngine subclass);
+# receipts stay pending while it is unset
+RECEIPT_OCR_ENGINE = config('RECEIPT_OCR_ENGINE', default='')
+
+# Expense search
+# Dotted path to a backend in apps.expenses.search; empty picks one from the database engine
+EXPENSE_SEARCH_BACKEND = config('EXPENSE_SEARCH_BACKEND', default='')
+EXPENSE_SEARCH_CONFIG = config('EXPENSE_SEARCH_CONFIG', default='english')
+
+# Seconds to cache expense summaries for (0 disables caching); needs CACHE_URL,
+# since invalidation only reaches a shared cache
+EXPENSE_SUMMARY_CACHE_TIMEOUT = config('EXPENSE_SUMMARY_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds to cache approvers' pending inbox counts for (0 disables caching);
+# needs CACHE_URL, since invalidation only reaches a shared cache
+APPROVAL_INBOX_COUNT_CACHE_TIMEOUT = config(
+    'APPROVAL_INBOX_COUNT_CACHE_TIMEOUT', default=300 if CACHE_URL else 0, cast=int
+)
+
+# Closed expenses unchanged for this many days are moved to the archive tables
+EXPENSE_ARCHIVE_AFTER_DAYS = config('EXPENSE_ARCHIVE_AFTER_DAYS', default=730, cast=int)
+
 # Logging
 LOGGING = {
     'version': 1,